@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcbench.py
+# Description: micro-benchmarks of the evaluation of zip contents against schemas
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+micro-benchmarks of the evaluation of zip contents against schemas
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import argparse                 # argument parsing
+import os                       # path filesystem
+import random                   # generation of synthetic contents
+import re                       # matching regular expressions
+import shutil                   # high-level file operations
+import sys                      # system accessing
+import tempfile                 # temporary files and directories
+import timeit                   # timing of code snippets
+
+# make the modules of zipwatch accessible
+sys.path.insert (1, os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'zipwatch'))
+
+import zwcconfig                # configuration files
+import zwcmatcher               # matching engines
+import zwcschema                # configuration schemas and its components
+
+# functions
+# -----------------------------------------------------------------------------
+
+# create a command parser to parse all params passed to the script
+# -----------------------------------------------------------------------------
+def createArgParser ():
+    """create a command parser to parse all params passed to the script"""
+
+    # initialize a parser
+    parser = argparse.ArgumentParser (description="micro-benchmarks of the evaluation of zip contents against schemas")
+
+    # now, add the arguments
+    parser.add_argument ('-c', '--configuration',
+                         type=str,
+                         default=os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'zipwatch', 'conf1.py'),
+                         help="configuration file whose schema is used in the benchmarks. By default 'conf1.py'")
+    parser.add_argument ('-n', '--entries',
+                         type=int,
+                         default=10000,
+                         help="number of entries of the synthetic zip file. By default, 10000")
+    parser.add_argument ('-k', '--components',
+                         type=int,
+                         default=200,
+                         help="number of synthetic components prepended to the schema to measure how engines scale with its size. By default, 200")
+    parser.add_argument ('-a', '--archives',
+                         type=int,
+                         default=10,
+                         help="number of synthetic zip files matched in a row to measure the benefits of caching. By default, 10")
+    parser.add_argument ('-d', '--dispatch',
+                         type=int,
+                         default=100000,
+                         help="number of entries of the synthetic zip file whose if-then functions are invoked to measure the cost of dispatching them. By default, 100000")
+    parser.add_argument ('-r', '--repeat',
+                         type=int,
+                         default=5,
+                         help="number of repetitions of each benchmark. The best time is reported. By default, 5")
+    parser.add_argument ('-s', '--seed',
+                         type=int,
+                         default=0,
+                         help="seed of the random generator. By default, 0")
+
+    # and return the parser
+    return parser
+
+
+# return a list with the names of a synthetic zip file
+# -----------------------------------------------------------------------------
+def syntheticContents (nbentries):
+    """return a list with the names of a synthetic zip file with the given number
+       of entries. It mimics a submission where students zipped build
+       directories and metadata along with the expected contents
+
+    """
+
+    root = "p1-346089-330696/"
+    contents = [root,
+                root + "346089-330696.pdf",
+                root + "autores.txt",
+                root + "parte-1/",
+                root + "parte-2/",
+                root + "parte-3/"]
+
+    # and now fill the zip file with random entries
+    while len (contents) < nbentries:
+        kind = random.randint (0, 3)
+        if kind == 0:
+            contents.append (root + "parte-{0}/file-{1}.dat".format (random.randint (1, 3), len (contents)))
+        elif kind == 1:
+            contents.append (root + "parte-3/node_modules/pkg-{0}/index.js".format (len (contents)))
+        elif kind == 2:
+            contents.append ("__MACOSX/" + root + "parte-1/._file-{0}.dat".format (len (contents)))
+        else:
+            contents.append (root + "build/obj-{0}.o".format (len (contents)))
+
+    return contents
+
+
+# return a schema specification with synthetic components
+# -----------------------------------------------------------------------------
+def syntheticSpec (spec, nbcomponents):
+    """return the given schema specification with the given number of synthetic
+       components prepended to it. They are relative to the root directory of
+       the configuration file, and none of them match the synthetic contents
+
+    """
+
+    return [(r'extra-{0}/(?P<name>[^/]+)\.dat$'.format (index), "", "")
+            for index in range (nbcomponents)] + spec
+
+
+# verify that the benchmark contents match the components of a schema
+# -----------------------------------------------------------------------------
+def verifyHits (schema, contents):
+    """return the fraction of the given contents which match any component of
+       the given schema. If none matches, a fatal error is raised, as the
+       benchmark would only measure the cost of rejecting contents
+
+    """
+
+    hits = sum (1 for icontent in contents if schema._matcher.match (icontent))
+    if not hits:
+        print (" Fatal error: no content matches the schema, check its root directory")
+        sys.exit (1)
+
+    return hits / len (contents)
+
+
+# report the time per entry of the given statement
+# -----------------------------------------------------------------------------
+def report (title, statement, nbentries, repeat):
+    """report the best time per entry of the given statement"""
+
+    best = min (timeit.repeat (statement, number=1, repeat=repeat))
+    print (" {0:<48}: {1:10.3f} us/entry".format (title, 1e6 * best / nbentries))
+
+
+# benchmarks
+# -----------------------------------------------------------------------------
+
+# per-entry cost of matching all contents against the components of a schema
+# -----------------------------------------------------------------------------
+def benchCompiled (configFile, contents, repeat):
+    """compare the per-entry cost of matching contents against the components of
+       the schema using raw pattern strings (thus relying on the cache of the re
+       module) and precompiled patterns. Components are matched against whole
+       contents, i.e., along with the root directory of the configuration file
+
+    """
+
+    spec = configFile.getList ("contentSpec")
+    schema = zwcschema.ZWCSchema (None, spec, configFile, root=configFile.getAttribute ("contentRoot"))
+    verifyHits (schema, contents)
+    regexps = [icomponent.getFullRegexp () for icomponent in schema._components]
+    patterns = [re.compile (iregexp).match for iregexp in regexps]
+
+    # in deployments with various configs or hundreds of patterns, the cache of
+    # the re module is thrashed. This is simulated by purging it before every
+    # entry
+    def raw (purge):
+        for icontent in contents:
+            if purge:
+                re.purge ()
+            for iregexp in regexps:
+                if re.match (iregexp, icontent):
+                    break
+
+    def compiled ():
+        for icontent in contents:
+            for ipattern in patterns:
+                if ipattern (icontent):
+                    break
+
+    report ("raw strings (warm re cache)", lambda: raw (False), len (contents), repeat)
+    report ("raw strings (thrashed re cache)", lambda: raw (True), len (contents), repeat)
+    report ("precompiled patterns", compiled, len (contents), repeat)
+
+
+# per-entry cost of finding the component matched by each content
+# -----------------------------------------------------------------------------
+def benchEngines (configFile, spec, contents, repeat, title="", backend="re"):
+    """compare the per-entry cost of finding the component matched by each content
+       with every matching engine. Components are relative to the root
+       directory of the configuration file, and the fraction of contents
+       matching any of them is shown as well
+
+    """
+
+    for engine in sorted (zwcmatcher.engines):
+
+        schema = zwcschema.ZWCSchema (None, spec, configFile, engine, backend, root=configFile.getAttribute ("contentRoot"))
+        hits = verifyHits (schema, contents)
+
+        def run ():
+            match = schema._matcher.match
+            for icontent in contents:
+                match (icontent)
+
+        report ("engine '{0}'{1}".format (engine, title), run, len (contents), repeat)
+
+    print (" {0:<48}: {1:10.2%}".format ("contents matched{0}".format (title), hits))
+
+
+# per-entry cost of matching the contents of many zip files with a cache
+# -----------------------------------------------------------------------------
+def benchCache (configFile, archives, repeat):
+    """compare the per-entry cost of matching the contents of many zip files in a
+       row with and without a cache. Caches are emptied before every
+       repetition
+
+    """
+
+    spec = configFile.getList ("contentSpec")
+    nbentries = sum (len (iarchive) for iarchive in archives)
+    for size in (0, zwcmatcher.CACHE_SIZE):
+
+        def run ():
+            zwcmatcher.caches.clear ()
+            schema = zwcschema.ZWCSchema (None, spec, configFile, cache=size, root=configFile.getAttribute ("contentRoot"))
+            for iarchive in archives:
+                schema.reset (None)
+                for icontent in iarchive:
+                    schema.match (icontent)
+            return schema
+
+        report ("cache of {0} contents".format (size), run, nbentries, repeat)
+        if size:
+            print (" {0:<48}: {1}".format ("", run ().getCache ()))
+
+
+# per-entry cost of evaluating all contents with the generic and the compiled
+# evaluators
+# -----------------------------------------------------------------------------
+def benchEvaluators (configFile, contents, repeat):
+    """compare the per-entry cost of evaluating contents with the generic
+       evaluator and with the evaluator compiled for the schema. As the if-then
+       functions of the configuration file examine the contents of zip files,
+       every component counts its matches with a built-in action instead
+
+    """
+
+    spec = [(ischema[0], "count", None, {'name': str (index)}) for index, ischema in enumerate (configFile.getList ("contentSpec"))]
+    for compiled in (False, True):
+
+        schema = zwcschema.ZWCSchema (None, spec, configFile, cache=0, root=configFile.getAttribute ("contentRoot"),
+                                      compiled=compiled)
+
+        def run ():
+            schema.reset (None)
+            schema.evaluate (contents)
+
+        report ("{0} evaluator".format ("compiled" if compiled else "generic"), run, len (contents), repeat)
+
+
+# per-entry cost of invoking the if-then functions of a configuration file
+# -----------------------------------------------------------------------------
+def benchDispatch (nbentries, repeat):
+    """compare the per-entry cost of invoking the if-then function of a component
+       matched by every content by executing a statement within the
+       configuration file, as done formerly, and by invoking the function
+       resolved once. A configuration file with an if-then function that does
+       nothing is created for this
+
+    """
+
+    directory = tempfile.mkdtemp ()
+    try:
+
+        # create the configuration file
+        filename = os.path.join (directory, "zwcdispatch.py")
+        with open (filename, "w") as stream:
+            stream.write ("contentSpec = [(r'.+\\.dat$', 'seen', None)]\n\n"
+                          "def seen (zipstream, regexp, content, matches):\n    pass\n\n"
+                          "def onSummary (zipstream):\n    pass\n\n"
+                          "def onError (msg, zipfile):\n    pass\n\n"
+                          "def onAbort (zipfile):\n    pass\n")
+        configFile = zwcconfig.ZWCConfigFile (filename)
+        configFile.verify ()
+
+        contents = ["p1-346089-330696/file-{0}.dat".format (index) for index in range (nbentries)]
+        schema = zwcschema.ZWCSchema (None, configFile.getList ("contentSpec"), configFile, cache=0)
+        component = schema._components[0]
+
+        def executed ():
+            command = "import {0}\n{0}.seen (zipstream, regexp, content, matches)".format (configFile.getNamespace ())
+            for icontent in contents:
+                exec (command, {'zipstream': None, 'regexp': component.getFullRegexp (),
+                                'content': icontent, 'matches': 1})
+
+        def resolved ():
+            for icontent in contents:
+                component.executeIfThen (None, icontent)
+
+        def evaluated ():
+            schema.reset (None)
+            schema.evaluate (contents)
+
+        report ("executed statements", executed, nbentries, repeat)
+        report ("resolved functions", resolved, nbentries, repeat)
+        report ("evaluation with resolved functions", evaluated, nbentries, repeat)
+
+    finally:
+        shutil.rmtree (directory)
+
+
+# cost of matching adversarial contents with every backend
+# -----------------------------------------------------------------------------
+def benchAdversarial (configFile, repeat):
+    """compare the cost of matching adversarial contents against a component whose
+       regular expression is prone to catastrophic backtracking with every
+       backend
+
+    """
+
+    spec = [(r'p1-(?P<nias>(\d+-?)+)/(?P<report>.+)\.pdf$', "", "")]
+    for length in (16, 18, 20, 22):
+
+        content = "p1-" + "1" * length + "!"
+        for backend in zwcschema.BACKENDS:
+
+            schema = zwcschema.ZWCSchema (None, spec, configFile, "sequential", backend)
+            match = schema._components[0].getMatchFunction ()
+            best = min (timeit.repeat (lambda: match (content), number=1, repeat=repeat))
+            print (" {0:<48}: {1:10.3f} ms".format ("{0} chars with '{1}' ({2})".format (len (content), backend, schema._components[0].getEngine ()),
+                                                  1e3 * best))
+
+
+# main
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+
+    # invoke the parser and parse all commands
+    params = createArgParser ().parse_args ()
+    random.seed (params.seed)
+
+    # load the configuration file
+    configFile = zwcconfig.ZWCConfigFile (params.configuration)
+    configFile.verify ()
+
+    # and create the synthetic contents
+    contents = syntheticContents (params.entries)
+
+    print ()
+    print (" Matching {0} entries with '{1}'".format (len (contents), os.path.basename (params.configuration)))
+    print ("---------------------------------------------------------------")
+    benchCompiled (configFile, contents, params.repeat)
+    benchEngines (configFile, configFile.getList ("contentSpec"), contents, params.repeat)
+    if params.components:
+        benchEngines (configFile,
+                      syntheticSpec (configFile.getList ("contentSpec"), params.components),
+                      contents, params.repeat,
+                      " (+{0} components)".format (params.components))
+    for backend in zwcschema.BACKENDS:
+        if backend != "re":
+            benchEngines (configFile, configFile.getList ("contentSpec"), contents, params.repeat,
+                          " ({0} backend)".format (backend), backend)
+
+    print ()
+    print (" Evaluating {0} entries with '{1}'".format (len (contents), os.path.basename (params.configuration)))
+    print ("---------------------------------------------------------------")
+    benchEvaluators (configFile, contents, params.repeat)
+
+    if params.dispatch:
+        print ()
+        print (" Invoking if-then functions of {0} entries".format (params.dispatch))
+        print ("---------------------------------------------------------------")
+        benchDispatch (params.dispatch, params.repeat)
+
+    print ()
+    print (" Matching {0} zip files with {1} entries each".format (params.archives, len (contents)))
+    print ("---------------------------------------------------------------")
+    benchCache (configFile, [syntheticContents (params.entries) for iarchive in range (params.archives)], params.repeat)
+
+    print ()
+    print (" Matching adversarial contents")
+    print ("---------------------------------------------------------------")
+    benchAdversarial (configFile, params.repeat)
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
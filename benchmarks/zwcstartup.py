@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcstartup.py
+# Description: benchmark of the time taken for importing the modules used by
+#              zipdog when it starts
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+benchmark of the time taken for importing the modules used by zipdog when it
+starts
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import argparse                 # argument parsing
+import os                       # path filesystem
+import subprocess               # execution of subprocesses
+import sys                      # system accessing
+import tempfile                 # temporary files and directories
+
+# constants
+# -----------------------------------------------------------------------------
+
+# directory with the modules of zipwatch
+ZIPWATCH = os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'zipwatch')
+
+# maximum time, in milliseconds, that importing all modules used by zipdog
+# should take. It was measured to be about 45 milliseconds, so that the budget
+# leaves room enough for slower machines, but not for importing heavy modules,
+# such as inspect or pyexcel, unless they are needed
+BUDGET = 80
+
+# functions
+# -----------------------------------------------------------------------------
+
+# create a command parser to parse all params passed to the script
+# -----------------------------------------------------------------------------
+def createArgParser ():
+    """create a command parser to parse all params passed to the script"""
+
+    # initialize a parser
+    parser = argparse.ArgumentParser (description="benchmark of the time taken for importing the modules used by zipdog when it starts")
+
+    # now, add the arguments
+    parser.add_argument ('-c', '--configuration',
+                         type=str,
+                         default=os.path.join (ZIPWATCH, 'odsconf1.py'),
+                         help="configuration file used by zipdog. By default 'odsconf1.py'")
+    parser.add_argument ('-b', '--budget',
+                         type=float,
+                         default=BUDGET,
+                         help="maximum time, in milliseconds, that importing all modules should take. By default, {0}".format (BUDGET))
+    parser.add_argument ('-m', '--modules',
+                         type=int,
+                         default=10,
+                         help="number of modules which take longest to be imported that are shown. By default, 10")
+    parser.add_argument ('-r', '--repeat',
+                         type=int,
+                         default=5,
+                         help="number of repetitions of the benchmark. The best time is reported. By default, 5")
+
+    # and return the parser
+    return parser
+
+
+# return the times taken for importing modules when starting zipdog
+# -----------------------------------------------------------------------------
+def importTimes (configuration, directory):
+    """return a dictionary with the time, in microseconds, taken for importing
+       every module when zipdog starts with the given configuration file and
+       only shows its schema, including the time taken for importing its own
+       imports. zipdog is run in a new interpreter from the given directory
+
+    """
+
+    process = subprocess.run ([sys.executable, "-X", "importtime", os.path.join (ZIPWATCH, 'zipdog.py'),
+                               "--configuration", configuration, "--files", "startup.zip", "--show-schema"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              cwd=directory, universal_newlines=True)
+
+    # every line shows the time taken for importing a module alone and with
+    # its own imports, which are shown indented before it
+    times = dict ()
+    for iline in process.stderr.splitlines ():
+        fields = iline.split ("|")
+        if len (fields) == 3 and fields[0].startswith ("import time:") and fields[1].strip ().isdigit ():
+            times[fields[2].rstrip ()] = int (fields[1])
+
+    return times
+
+
+# main
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+
+    # parse the arguments
+    params = createArgParser ().parse_args ()
+
+    # run zipdog several times and keep the fastest run. Only modules imported
+    # by no other module are considered for computing the total time
+    best = None
+    with tempfile.TemporaryDirectory () as directory:
+        for irun in range (params.repeat):
+            times = importTimes (os.path.abspath (params.configuration), directory)
+            total = sum (itime for imodule, itime in times.items () if not imodule.startswith ("  "))
+            if best is None or total < best[0]:
+                best = (total, times)
+    (total, times) = best
+
+    print (" Importing the modules of zipdog with '{0}'".format (os.path.basename (params.configuration)))
+    print ("---------------------------------------------------------------")
+    for imodule, itime in sorted (times.items (), key=lambda item: -item[1])[:params.modules]:
+        print (" {0:<40} {1:10.2f} ms".format (imodule, itime / 1000))
+    print ("---------------------------------------------------------------")
+    print (" {0:<40} {1:10.2f} ms".format ("total", total / 1000))
+    print (" {0:<40} {1:10.2f} ms".format ("budget", params.budget))
+    print (" pyexcel imported: {0}".format (any (imodule.strip () == "pyexcel" for imodule in times)))
+
+    # and fail if the budget is exceeded
+    if total / 1000 > params.budget:
+        print (" Fatal error: importing the modules of zipdog took {0:.2f} ms, which exceeds the budget of {1} ms".format (total / 1000, params.budget))
+        sys.exit (1)
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_zwcanalysis.py
+# Description: tests of the static analysis of the regular expressions of
+#              schemas
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+tests of the static analysis of the regular expressions of schemas
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import os                       # path filesystem
+import re                       # matching regular expressions
+import sys                      # system accessing
+import unittest                 # unit testing framework
+
+# make the modules of zipwatch accessible
+sys.path.insert (1, os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'zipwatch'))
+
+import zwcanalysis              # static analysis of regular expressions
+
+# -----------------------------------------------------------------------------
+# TestBacktrackingRisks
+#
+# Tests of the detection of shapes prone to catastrophic backtracking
+# -----------------------------------------------------------------------------
+class TestBacktrackingRisks (unittest.TestCase):
+    """Tests of the detection of shapes prone to catastrophic backtracking"""
+
+    def assertRisky (self, pattern, risk):
+        """verify that the given regular expression is reported with the given
+           risk
+
+        """
+
+        self.assertIn (risk, zwcanalysis.backtrackingRisks (re.compile (pattern)), pattern)
+
+
+    def assertSafe (self, pattern):
+        """verify that the given regular expression is not reported"""
+
+        self.assertEqual (zwcanalysis.backtrackingRisks (re.compile (pattern)), [], pattern)
+
+
+    def test_nested (self):
+        """nested repetitions that can match the same chars are reported"""
+
+        for pattern in (r'(a+)+', r'(\d+-?)*', r'p1-(?P<nias>(\d+-?)+)/(?P<report>.+)\.pdf$'):
+            self.assertRisky (pattern, "nested repetitions that can match the same chars")
+
+
+    def test_consecutive (self):
+        """consecutive repetitions that can match the same chars are reported"""
+
+        self.assertRisky (r'(a*b?a*)+', "consecutive repetitions that can match the same chars within a repetition")
+
+
+    def test_alternatives (self):
+        """alternatives that can match the same chars are reported, even when the
+           parser factors out the prefix shared by all of them
+
+        """
+
+        for pattern in (r'(ab|a.)*', r'(a|a)*', r'(a|a)*$', r'(x|x)*y', r'(aa|a)*$', r'(a|aa)+$'):
+            self.assertRisky (pattern, "alternatives that can match the same chars within a repetition")
+
+
+    def test_safe (self):
+        """alternatives and repetitions that can not match the same chars are not
+           reported
+
+        """
+
+        for pattern in (r'(a|b)*', r'(abc|abd)*', r'(\.txt|\.pdf)*', r'(a|ab)*$', r'(ab|abc)*d',
+                        r'p1-(?P<nias>\d+(-\d+)*)/', r'(a|aa)$'):
+            self.assertSafe (pattern)
+
+
+# main
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main ()
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_zwcschema.py
+# Description: tests of the evaluation of the contents of zip files against
+#              schemas
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+tests of the evaluation of the contents of zip files against schemas
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import os                       # path filesystem
+import shutil                   # high-level file operations
+import sys                      # system accessing
+import tempfile                 # temporary files and directories
+import unittest                 # unit testing framework
+import zipfile                  # zip files management
+from unittest import mock       # replacement of functions
+
+# make the modules of zipwatch accessible
+ZIPWATCH = os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'zipwatch')
+sys.path.insert (1, ZIPWATCH)
+
+import zwcconfig                # configuration files
+import zwcschema                # configuration schemas and its components
+
+# -----------------------------------------------------------------------------
+# TestParents
+#
+# Tests of components which depend upon a parent component
+# -----------------------------------------------------------------------------
+class TestParents (unittest.TestCase):
+    """Tests of components which depend upon a parent component"""
+
+    @classmethod
+    def setUpClass (cls):
+        """create a configuration file with no functions"""
+
+        cls.directory = tempfile.mkdtemp ()
+        filename = os.path.join (cls.directory, "zwcparents.py")
+        with open (filename, "w") as stream:
+            stream.write ("contentSpec = []\n\n"
+                          "def onSummary (zipstream):\n    pass\n\n"
+                          "def onError (msg, zipfile):\n    pass\n\n"
+                          "def onAbort (zipfile):\n    pass\n")
+        cls.configFile = zwcconfig.ZWCConfigFile (filename)
+
+
+    @classmethod
+    def tearDownClass (cls):
+        """remove the configuration file"""
+
+        shutil.rmtree (cls.directory)
+
+
+    def evaluate (self, spec, contents, regexp):
+        """return the schema created with the given specification after evaluating
+           the given contents, and the number of contents the component with the
+           given regular expression was matched against
+
+        """
+
+        (calls, getMatchFunction) = ([], zwcschema.ZWCSchemaComponent.getMatchFunction)
+        def spy (component):
+            function = getMatchFunction (component)
+            if component.getRegexp () != regexp:
+                return function
+            def match (content):
+                calls.append (content)
+                return function (content)
+            return match
+
+        with mock.patch.object (zwcschema.ZWCSchemaComponent, 'getMatchFunction', spy):
+            schema = zwcschema.ZWCSchema (None, spec, self.configFile, cache=0)
+            schema.evaluate (contents)
+
+        return (schema, len (calls))
+
+
+    def test_missing (self):
+        """children are never matched if their parent is missing"""
+
+        spec = [(r'dir/$', "", "", {'name': "dir"}),
+                (r'dir/.+$', "", "", {'parent': "dir"}),
+                (r'.+$', "", "")]
+        contents = ["other/file-{0}.dat".format (index) for index in range (1000)]
+        (schema, calls) = self.evaluate (spec, contents, r'dir/.+$')
+
+        self.assertEqual (calls, 0)
+        self.assertEqual ([icomponent.getMatches () for icomponent in schema._components], [0, 0, 1000])
+
+
+    def test_present (self):
+        """children are matched if their parent is present, even if it has no
+           explicit entry
+
+        """
+
+        spec = [(r'dir/$', "", "", {'name': "dir"}),
+                (r'dir/.+$', "", "", {'parent': "dir"}),
+                (r'.+$', "", "")]
+        for contents in (["dir/", "dir/a", "b"], ["dir/a", "b"]):
+            (schema, calls) = self.evaluate (spec, contents, r'dir/.+$')
+
+            self.assertGreater (calls, 0)
+            self.assertEqual ([icomponent.getMatches () for icomponent in schema._components],
+                              [contents.count ("dir/"), 1, 1])
+
+
+    def test_iterator (self):
+        """contents given as an iterator are evaluated the same as if they were
+           given as a list
+
+        """
+
+        spec = [(r'dir/$', "", "", {'name': "dir"}),
+                (r'dir/.+$', "", "", {'parent': "dir"}),
+                (r'.+$', "", "", {'required': True})]
+        contents = ["dir/", "dir/a", "b"]
+        (schema, calls) = self.evaluate (spec, iter (contents), r'dir/.+$')
+
+        self.assertEqual ([icomponent.getMatches () for icomponent in schema._components], [1, 1, 1])
+
+
+# -----------------------------------------------------------------------------
+# TestCompiled
+#
+# Tests of the evaluator compiled for the schemas of the shipped configuration
+# files
+# -----------------------------------------------------------------------------
+class TestCompiled (unittest.TestCase):
+    """Tests of the evaluator compiled for the schemas of the shipped
+       configuration files, which have required components and components
+       with a parent
+
+    """
+
+    def setUp (self):
+        """create a directory for copying configuration files, so that their
+           compiled evaluators are cached there
+
+        """
+
+        self.directory = tempfile.mkdtemp ()
+
+
+    def tearDown (self):
+        """remove the directory of configuration files"""
+
+        shutil.rmtree (self.directory)
+
+
+    def evaluate (self, configuration, entries):
+        """return the number of matches of every component of the schema of the
+           given configuration file after evaluating a zip file with the given
+           entries, a list of pairs (name, data), with the generic and the
+           compiled evaluators, along with the number of times the latter was
+           invoked. The compiled one verifies every content against the generic
+           one
+
+        """
+
+        filename = os.path.join (self.directory, configuration)
+        shutil.copy (os.path.join (ZIPWATCH, configuration), filename)
+        configFile = zwcconfig.ZWCConfigFile (filename)
+        configFile.verify ()
+
+        zipname = os.path.join (self.directory, "submission.zip")
+        with zipfile.ZipFile (zipname, "w") as stream:
+            for name, data in entries:
+                stream.writestr (name, data)
+
+        (matches, calls) = (list (), list ())
+        for compiled in (False, True):
+
+            schema = zwcschema.ZWCSchema (None, configFile.getList ("contentSpec"), configFile, cache=0,
+                                          root=configFile.getAttribute ("contentRoot"), compiled=compiled, check=True)
+            if compiled:
+                self.assertIsNotNone (schema._evaluator)
+                evaluator = schema._evaluator
+                def spy (schema, contents):
+                    calls.append (contents)
+                    return evaluator (schema, contents)
+                schema._evaluator = spy
+
+            with zipfile.ZipFile (zipname) as zipstream:
+                schema.reset (zipstream)
+                schema.evaluate (zwcschema.ZWCNames (zipstream))
+            matches.append (([icomponent.getMatches () for icomponent in schema._components], schema._disabled))
+
+        return (matches[0], matches[1], len (calls))
+
+
+    def test_shipped (self):
+        """the compiled evaluator is used with the shipped configuration files,
+           and it matches the same components than the generic one, even when
+           components are disabled as their parent is missing
+
+        """
+
+        for configuration, root in (("conf1.py", "p1-346089-330696/"), ("conf2.py", "p2-346089-330696/")):
+            entries = [(root, ""),
+                       (root + "346089-330696.pdf", ""),
+                       (root + "autores.txt", "346089 Turing, Alan\n330696 Lovelace, Ada\n"),
+                       (root + "parte-1/", ""),
+                       (root + "parte-1/a.txt", ""),
+                       (root + "parte-2/b.txt", "")]
+            (generic, compiled, calls) = self.evaluate (configuration, entries)
+
+            self.assertEqual (calls, 1, configuration)
+            self.assertEqual (generic, compiled, configuration)
+            self.assertEqual (configuration == "conf1.py", bool (compiled[1]), configuration)
+
+
+# main
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main ()
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -18,7 +18,8 @@ import os                       # file handling
 import re                       # matching regular expressions
 import sys                      # system accessing
 
-import pyexcel
+# note that pyexcel is imported only in the epilogue, where it is used, as it
+# takes long to be imported
 
 # CONTENTS
 # -----------------------------------------------------------------------------
@@ -30,6 +31,8 @@ import pyexcel
 # items with the names given below:
 #
 # contentSpec: schema definition
+# contentRoot (optional): regular expression of the root directory of all
+#                         contents
 #
 # functions:
 #
@@ -87,7 +90,10 @@ import pyexcel
 # the following information:
 #
 #    1. Regular expression that might be matched by one specific
-#       filename/directory in the zip file
+#       filename/directory in the zip file. Alternatively, typed components
+#       defined in zwckinds can be given: Exact, Prefix, Suffix and Glob
+#       match exact paths, prefixes, suffixes and unix filename patterns
+#       respectively, and they are resolved faster than regular expressions
 #
 #    2. if-then action. It is a function provided in this file which should be
 #       invoked if a specific file/directory matches the regular expression
@@ -98,11 +104,23 @@ import pyexcel
 #          2. Regular expression matched
 #          3. Specific content that matched the regular expression
 #          4. Number of matches of this component
+#          5. Dictionary with the named groups of the match. This argument is
+#             optional, i.e., it is given only to functions that accept it
 #
 #       If no action should be taken when the regular expression matches any of
 #       the contents of the zipfile, None can be given. Otherwise, the
 #       corresponding if-then function should be provided in the configuration
-#       file.
+#       file, unless the name of a built-in action is given instead:
+#
+#          flag: records True if any content matched the regular expression
+#          count: records the number of contents that matched it
+#          collect: records the list of contents that matched it
+#          collect-basename: records the list with the basename of all the
+#                            contents that matched it
+#
+#       Built-in actions are executed by zipwatch without invoking this file,
+#       and their results are given to tearDown and onSummary, e.g.,
+#       result['part1Files'], under the name given in the options (see below)
 #
 #    3. if-else action. It is a function provided in this file which should be
 #       invoked in case no file/directory in the zip file matched the given
@@ -118,6 +136,59 @@ import pyexcel
 #       If no action should be taken in case of unmatch, None can be
 #       given. Otherwise, the corresponding if-else function should be provided
 #       in the configuration file.
+#
+#    4. options (optional). A dictionary with additional options of the
+#       component:
+#
+#          subtree: if True, whenever a directory matches the regular
+#                   expression, all its contents are considered to match it as
+#                   well, so that they are not examined individually when zip
+#                   files are evaluated as trees with --tree
+#
+#          batch: if True, the if-then function is invoked only once after
+#                 examining all the contents of the zip file, instead of once
+#                 per content. It then receives the list of pairs (content,
+#                 groups) of all contents that matched the regular expression,
+#                 in order, where groups is a dictionary with its named groups
+#
+#          absolute: if True, the regular expression is matched against the
+#                    whole path of contents even if a root directory is given
+#                    (see below)
+#
+#          min: minimum number of contents that should match the regular
+#               expression
+#
+#          max: maximum number of contents that can match the regular
+#               expression
+#
+#          violation: name of the function invoked instead of the if-else
+#                     function when the number of matches is not within min and
+#                     max (see below)
+#
+#          required: if True, all contents of the zip file are examined first
+#                    to verify that at least one of them matches the regular
+#                    expression. Otherwise, the if-else function is invoked and
+#                    the zip file is aborted before invoking any if-then
+#                    function
+#
+#          parent: name of another component this one depends upon. If the
+#                  parent does not match any content, this component is not
+#                  matched and its if-else function is not invoked. Note that
+#                  directories are matched even if zip files have no entry
+#                  for them
+#
+#          name: name of the component, used by other components to refer to
+#                it and for the result of its built-in action, if any. By default,
+#                the regular expression
+#
+# ROOT DEFINITION:
+# -----------------------------------------------------------------------------
+# optionally, a regular expression with the root directory of all contents can
+# be given. If so, it is matched only once against every top-level directory
+# (up to its first slash) and the regular expressions of the schema are matched
+# only against the rest of the path of contents, unless they are given the
+# option absolute. The named groups of the root are given to if-then functions
+# along with those of the regular expression matched
 
 # IF-THEN ACTIONS
 # -----------------------------------------------------------------------------
@@ -127,6 +198,7 @@ import pyexcel
 #    2. Regular expression matched
 #    3. Specific content that matched the regular expression
 #    4. Number of matches of this component
+#    5. Dictionary with the named groups of the match (optional)
 #
 # and can be used to do anything, e.g., registering data in a class that records
 # useful information from the zip file
@@ -138,6 +210,13 @@ import pyexcel
 #
 # which is an instance of zwcschema.ZWCSchemaComponent
 
+# VIOLATION ACTIONS
+# -----------------------------------------------------------------------------
+# violation actions are ordinary functions that receive the same arguments than
+# if-else actions. They are invoked once all contents have been examined, if
+# the number of matches of a component is not within its min and max. If a
+# component is given no violation action, its if-else action is invoked instead
+
 # preamble
 # -----------------------------------------------------------------------------
 # this function is optional. If given, it is invoked automatically by zipwatch
@@ -154,7 +233,8 @@ import pyexcel
 # this function is optional. If given, it is invoked automatically by zipwatch
 # after processing the contents of a zipfile. It can be used to clean-up
 # structures or to start other processes with the information retrieved from the
-# zipfile.
+# zipfile. If it accepts a second argument, it receives the results of the
+# built-in actions
 
 # epilogue
 # -----------------------------------------------------------------------------
@@ -165,7 +245,8 @@ import pyexcel
 # -----------------------------------------------------------------------------
 # this function is mandatory and should be provided in this module. It would be
 # invoked automatically by zipwatch in case the user explicitly requested seeing
-# a summary of all the relevant information extracted from the zip file
+# a summary of all the relevant information extracted from the zip file. If it
+# accepts a second argument, it receives the results of the built-in actions
 
 # onError
 # -----------------------------------------------------------------------------
@@ -178,58 +259,69 @@ import pyexcel
 # automatically invoked by zipwatch in case of an error reported by the
 # configuration file, e.g., incorrect contents of a zip file
 
+# ROOT DEFINITION:
+# -----------------------------------------------------------------------------
+# all contents should be under a directory named after the NIAs of the students
+contentRoot = r'p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/'
+
 # SCHEMA DEFINITION:
 # -----------------------------------------------------------------------------
 # create the schema specification by hand
 contentSpec = [
         
     # report in pdf format
-    (r'p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/(?P<nia3>\d{6})(-(?P<nia4>\d{6}))?\.pdf$',
+    (r'(?P<nia3>\d{6})(-(?P<nia4>\d{6}))?\.pdf$',
      "report",
      "reportKO"),
     
-    # authors 
-    (r'p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/autores\.txt$',
+    # authors. It is required and only one authors file is allowed
+    (r'autores\.txt$',
      "authors",
-     "authorsKO"),
+     "authorsKO",
+     {'max': 1, 'violation': "authorsMany", 'required': True}),
     
     # directory of the first part of the lab assignment
-    (r'p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/parte-1/$',
+    (r'parte-1/$',
      "part1Directory",
-     "part1DirectoryKO"),
+     "part1DirectoryKO",
+     {'name': "part1Directory"}),
     
     # directory with the solutions to the first part of the lab
     # assignment
-    (r'p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/parte-1/.+$',
+    (r'parte-1/.+$',
      "part1File",
-     "part1FileKO"),
+     "part1FileKO",
+     {'parent': "part1Directory"}),
     
     # directory with the second part of the lab assignment
-    (r'p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/parte-2/$',
+    (r'parte-2/$',
      "part2Directory",
-     "part2DirectoryKO"),
+     "part2DirectoryKO",
+     {'name': "part2Directory"}),
     
     # directory with the solutions to the second part of the lab
     # assignment
-    (r'p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/parte-2/.+$',
+    (r'parte-2/.+$',
      "part2File",
-     "part2FileKO"),
+     "part2FileKO",
+     {'parent': "part2Directory"}),
     
     # # directory with the third part of the lab assignment
-    # ("p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/parte-3/$",
+    # ("parte-3/$",
     #  "part3Directory",
     #  "part3DirectoryKO"),
 
     # # directory with the solutions to the third part of the lab
     # # assignment
-    # ("p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/parte-3/.+$",
+    # ("parte-3/.+$",
     #  "part3File",
     #  "part3FileKO"),
 
     # warn the user in case (s)he is submitting metadata
     (r'(__MACOSX|\._Store)',
      "metadata",
-     None)
+     None,
+     {'subtree': True, 'absolute': True})
     
 ]
 
@@ -475,13 +567,18 @@ class CheckLists:
 # -----------------------------------------------------------------------------
 
 # verifies the root directory of the specified contents
-def verifyRootDirectory (content):
-    """verifies the root directory of the specified contents"""
+def verifyRootDirectory (content, groups=None):
+    """verifies the root directory of the specified contents. If the named groups
+       of the component matched by the content are given, they are used instead
+       of matching the root directory again
+
+    """
 
     # match the contents of this content against a regular expression of the
-    # root directory
-    rootregexp = r'^p1-(?P<nia1>\d{6})(-(?P<nia2>\d{6}))?/'
-    m = re.match (rootregexp, content)
+    # root directory, unless the named groups of the component matched are
+    # given, as they already contain the NIAs of the root directory
+    rootregexp = "^" + contentRoot
+    m = groups if groups and 'nia1' in groups else re.match (rootregexp, content)
     if not m:
         print (" Fatal error: the root directory has not been found")
         print ("              upon decompressing the zip file, all files should be under a directory matching")
@@ -496,7 +593,7 @@ def verifyRootDirectory (content):
 
     # if the content matched this expression verify that NIAs are used
     # consistently
-    (nia1, nia2) = (m.group ('nia1'), m.group ('nia2'))
+    (nia1, nia2) = (m['nia1'], m['nia2'])
     if (Summary._nia1 or Summary._nia2) and \
        ( (Summary._nia1 != nia1 and Summary._nia1 != nia2) or
          (Summary._nia2 != nia1 and Summary._nia2 != nia2) ):
@@ -546,19 +643,19 @@ def getStudentInfo (content):
 #    2. Regular expression matched
 #    3. Specific content that matched the regular expression
 #    4. Number of matches of this component
+#    5. Dictionary with the named groups of the match (optional)
 #
 # note that all contents certainly match the regexp
 
 # acknowledges the presence of the report
-def report (zipstream, regexp, content, matches):
+def report (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of the report"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
     
-    # extract information
-    m = re.match (regexp, content)
-    (nia1, nia2, nia3, nia4) = (m.group ('nia1'), m.group ('nia2'), m.group ('nia3'), m.group ('nia4'))
+    # extract information from the named groups of the match
+    (nia1, nia2, nia3, nia4) = (groups['nia1'], groups['nia2'], groups['nia3'], groups['nia4'])
 
     # error checking
     if ((nia1 != nia3 and nia1 != nia4) or
@@ -570,11 +667,11 @@ def report (zipstream, regexp, content, matches):
     Summary._report = os.path.basename (content)
 
 # acknowledges the presence of the authors file
-def authors (zipstream, regexp, content, matches):
+def authors (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of the authors file"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
 
     # retrieve the contents of the authors file
     with zipstream.open (content) as stream:
@@ -632,66 +729,66 @@ def authors (zipstream, regexp, content, matches):
         
 
 # acknowledges the presence of the folder containing the first part
-def part1Directory (zipstream, regexp, content, matches):
+def part1Directory (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of the folder containing the first part"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
     
     # record the presence of the directory with the first part of the
     # lab assignment
     Summary._part1Directory = True
 
 # acknowledges the presence of a file in the folder containing the first part
-def part1File (zipstream, regexp, content, matches):
+def part1File (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of a file in the folder containing the first part"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
     
     # record the existence of this file in the first part of the lab
     # assignment
     Summary._part1Files.append (os.path.basename (content))
 
 # acknowledges the presence of the folder containing the second part
-def part2Directory (zipstream, regexp, content, matches):
+def part2Directory (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of the folder containing the second part"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
     
     # record the presence of the directory with the second part of the
     # lab assignment
     Summary._part2Directory = True
 
 # acknowledges the presence of a file in the folder containing the second part
-def part2File (zipstream, regexp, content, matches):
+def part2File (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of a file in the folder containing the second part"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
     
     # record the existence of this file in the second part of the lab
     # assignment
     Summary._part2Files.append (os.path.basename (content))
 
 # acknowledges the presence of the folder containing the third part
-def part3Directory (zipstream, regexp, content, matches):
+def part3Directory (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of the folder containing the third part"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
     
     # record the presence of the directory with the third part of the
     # lab assignment
     Summary._part3Directory = True
 
 # acknowledges the presence of a file in the folder containing the third part
-def part3File (zipstream, regexp, content, matches):
+def part3File (zipstream, regexp, content, matches, groups):
     """acknowledges the presence of a file in the folder containing the third part"""
 
     # verify the root directory
-    verifyRootDirectory (content)
+    verifyRootDirectory (content, groups)
     
     # record the existence of this file in the third part of the lab
     # assignment
@@ -727,7 +824,7 @@ def reportKO (component):
     print ("              location. Make sure to locate the pdf report in the root directory. The name should")
     print ("              adhere to the regular expression given below")
     print ()
-    print (" Regular expression: {0}".format (component.getRegexp ()))
+    print (" Regular expression: {0}".format (component.getFullRegexp ()))
     print (" Example           : p1-346089-330696/346089-330696.pdf")
     print ()
     print (" INVALID ZIP FILE!")
@@ -742,7 +839,7 @@ def authorsKO (component):
     print ("              Make sure to locate the authors file in the root directory. The name should adhere")
     print ("              to the regular expression given below")
     print ()
-    print (" Regular expression: {0}".format (component.getRegexp ()))
+    print (" Regular expression: {0}".format (component.getFullRegexp ()))
     print (" Example           : p1-346089-330696/autores.txt")
     print ()
     print (" INVALID ZIP FILE!")
@@ -769,13 +866,11 @@ def part1FileKO (component):
 
        This is not a fatal error, but the user should be warned much the same"""
 
-    # show the message only in case the directory was found, otherwise, it is
-    # obvious there are no files within an unexistent directory! ;)
-    if (Summary._part1Directory):
-    
-        print (" Warning: the folder with the first part 'parte-1/' contains no files")
-        print ("          this does not invalidate your .zip file but be warned that your first part will score 0")
-        print ()
+    # note that this is invoked only if the directory was found, as this
+    # component depends upon it
+    print (" Warning: the folder with the first part 'parte-1/' contains no files")
+    print ("          this does not invalidate your .zip file but be warned that your first part will score 0")
+    print ()
 
     Summary._part1Files = []
     
@@ -797,13 +892,11 @@ def part2FileKO (component):
 
        This is not a fatal error, but the user should be warned much the same"""
 
-    # show the message only in case the directory was found, otherwise, it is
-    # obvious there are no files within an unexistent directory! ;)
-    if (Summary._part2Directory):
-    
-        print (" Warning: the folder with the second part 'parte-2/' contains no files")
-        print ("          this does not invalidate your .zip file but be warned that your second part will score 0")
-        print ()
+    # note that this is invoked only if the directory was found, as this
+    # component depends upon it
+    print (" Warning: the folder with the second part 'parte-2/' contains no files")
+    print ("          this does not invalidate your .zip file but be warned that your second part will score 0")
+    print ()
 
     Summary._part2Files = []
     
@@ -826,17 +919,38 @@ def part3FileKO (component):
 
        This is not a fatal error, but the user should be warned much the same"""
 
-    # show the message only in case the directory was found, otherwise, it is
-    # obvious there are no files within an unexistent directory! ;)
-    if (Summary._part3Directory):
-    
-        print (" Warning: the folder with the third part 'parte-3/' contains no files")
-        print ("          this does not invalidate your .zip file but be warned that you will not be awarded with")
-        print ("          the extra point granted for doing this part of the lab assignment")
-        print ()
+    # note that this is invoked only if the directory was found, as this
+    # component depends upon it
+    print (" Warning: the folder with the third part 'parte-3/' contains no files")
+    print ("          this does not invalidate your .zip file but be warned that you will not be awarded with")
+    print ("          the extra point granted for doing this part of the lab assignment")
+    print ()
     
     Summary._part3Files = []
 
+# VIOLATION ACTIONS
+# -----------------------------------------------------------------------------
+
+# all violation functions registered in the schema receive the following args:
+#
+#    1. schema component whose number of matches is not within its min and max
+
+# reports that more than one authors file has been provided
+def authorsMany (component):
+    """reports that more than one authors file has been provided"""
+
+    print (" Fatal error: {0} authors files have been found but only one is allowed.".format (component.getMatches ()))
+    print ("              Make sure to locate a single authors file in the root directory. The name should adhere")
+    print ("              to the regular expression given below")
+    print ()
+    print (" Regular expression: {0}".format (component.getFullRegexp ()))
+    print (" Example           : p1-346089-330696/autores.txt")
+    print ()
+    print (" INVALID ZIP FILE!")
+
+    # error so that execution should immediately halt
+    raise SystemExit
+
 # preamble
 # -----------------------------------------------------------------------------
 def preamble ():
@@ -934,6 +1048,7 @@ def epilogue ():
         statuses.append (entry.get ())
 
     # save both sheets in the same spreadsheet
+    import pyexcel
     bookdict = {
         'Status' : statuses,
         'Entries': contents
@@ -20,7 +20,9 @@ import sys                      # system accessing
 import zipfile                  # zip files management
 
 import zwcconfig                # configuration files
+import zwcmatcher               # matching engines
 import zwcschema                # configuration schemas and its components
+import zwcstats                 # statistics of components
 import zwcversion               # package version
 
 # functions
@@ -49,7 +51,41 @@ def createArgParser ():
     optional.add_argument ('-c', '--configuration',
                             type=str,
                             default="conf.py",
-                            help="provides the name of the configuration file to use. By default 'conf.py'")
+                            help="provides the name of the configuration file to use, either as a path or as a resource of a package with the syntax 'package:filename'. By default 'conf.py'")
+    optional.add_argument ('-e', '--engine',
+                           type=str,
+                           choices=sorted (zwcmatcher.engines),
+                           default="sequential",
+                           help="matching engine used to find the component of the schema matched by each content. 'sequential' matches contents against each component in turn, 'alternation' matches them against a single regular expression combining all components, and 'prefilter' matches them only against the components whose literals occur in them, which pays off only with schemas of about 30 components or more. Smaller schemas are matched as with 'sequential' instead. By default 'sequential'")
+    optional.add_argument ('-b', '--backend',
+                           type=str,
+                           choices=["re", "linear"],
+                           default="re",
+                           help="backend used for matching regular expressions. 're' uses the re module, whereas 'linear' simulates automata whose running time is linear in the length of the contents, so that untrusted names can not trigger catastrophic backtracking. Regular expressions not supported by 'linear' are matched with 're'. By default 're'")
+    optional.add_argument ('--budget',
+                           type=float,
+                           help="maximum number of seconds to spend matching each content of zip files. Contents exceeding it are considered to match no component and they are reported. Budgets are only enforced on Unix systems. By default, there is no budget")
+    optional.add_argument ('--cache',
+                           type=int,
+                           default=0,
+                           help="number of contents (e.g., {0}) whose matching is remembered across zip files, so that contents found in many of them (e.g., '__MACOSX/') are matched only once. It pays off only if many contents are repeated across zip files (about 40%% of them with the shipped configuration files) or if matching them is expensive, e.g., with the linear backend. By default 0, i.e., nothing is remembered".format (zwcmatcher.CACHE_SIZE))
+    optional.add_argument ('--stats',
+                           type=str,
+                           nargs='?',
+                           const="",
+                           help="if given, the number of contents matched by every component is recorded across runs in the given file, so that components matching more contents are matched first, whenever that does not change the component matched by any content. The order used is shown with --show-schema. If no file is given, the name of the configuration file with the extension '.stats' is used. Otherwise, statistics are not recorded, though those found in the latter file, if any, are used")
+    optional.add_argument ('--no-stats',
+                           action='store_true',
+                           help="if given, statistics are neither used nor recorded")
+    optional.add_argument ('-C', '--compile',
+                           action='store_true',
+                           help="if given, the contents of zip files are evaluated with a python function generated for the schema of the configuration file, which is cached in the directory '__zwccache__' next to it. It is not used with --tree or --budget")
+    optional.add_argument ('--check',
+                           action='store_true',
+                           help="if given along with --compile, the component matched by every content with the generated function is verified to be the same matched by the generic evaluator. Otherwise, execution is aborted")
+    optional.add_argument ('-t', '--tree',
+                           action='store_true',
+                           help="if given, the contents of zip files are arranged in a tree of paths, so that components matching whole subtrees (e.g., '__MACOSX/') do not examine their contents individually")
     optional.add_argument ('-s', '--show-summary',
                            action='store_true',
                            help="if given, a summary with all the information extracted from the zip file is shown")
@@ -81,17 +117,36 @@ if __name__ == '__main__':
     configFile = zwcconfig.ZWCConfigFile (params.configuration)
     configFile.verify ()
 
+    # get the lifecycle functions of the configuration file, which are
+    # resolved only once. Both tearDown and onSummary are given the results of
+    # built-in actions if they accept them
+    hooks = configFile.getHooks ()
+    (tearDownResult, onSummaryResult) = (configFile.acceptsArguments ("tearDown", 2),
+                                         configFile.acceptsArguments ("onSummary", 2))
+
     # invoke the preamble before starting the whole process
-    configFile.preamble ()
+    hooks.preamble ()
         
+    # load the statistics of previous runs, unless they are disabled. They are
+    # recorded only if requested, as the configuration file might be located
+    # in a directory which should not be modified, e.g., an installed package
+    stats = None
+    if not params.no_stats:
+        filename = params.stats or os.path.splitext (configFile.getPath ())[0] + ".stats"
+        if params.stats is not None or os.path.exists (filename):
+            stats = zwcstats.ZWCStats (filename)
+
+    # create a schema from the specification given in the configuration file
+    # (along with its root directory, if any) but attached to no zipstream
+    # ---as none has been opened yet. The same schema is reused for all zip
+    # files
+    schema = zwcschema.ZWCSchema (None, configFile.getList ("contentSpec"), configFile, params.engine, params.backend, params.budget, params.cache,
+                                  configFile.getAttribute ("contentRoot"), stats=stats, compiled=params.compile, check=params.check)
+
     # check whether show-schema has been requested
     if '--show-schema' in sys.argv or \
        '-S' in sys.argv:
         
-        # create a schema from the specification given in the configuration file
-        # but attached to no zipstream ---as none has been opened and none
-        # should be opened
-        schema = zwcschema.ZWCSchema (None, configFile.getList ("contentSpec"), configFile)
         print (schema)
         sys.exit (0)
 
@@ -107,35 +162,61 @@ if __name__ == '__main__':
             with zipfile.ZipFile (ifile) as zipstream:
 
                 # execute the pramble of the configuration file
-                configFile.setUp (zipstream)
+                hooks.setUp (zipstream)
+
+                # attach the schema to this zip file
+                schema.reset (zipstream)
 
-                # create a schema from the specification given in the
-                # configuration file
-                schema = zwcschema.ZWCSchema (zipstream, configFile.getList ("contentSpec"), configFile)
+                # evaluate the contents of this zip file against the schema as
+                # they are read from its directory, which might be examined
+                # more than once if any component is required or has a parent
+                contents = zwcschema.ZWCNames (zipstream)
+                if params.tree:
+                    schema.evaluateTree (contents)
+                else:
+                    schema.evaluate (contents)
 
-                # evaluate the contents of this zip file against the schema
-                schema.evaluate (zipstream.namelist ())
+                # report those contents whose matching exceeded the budget
+                for ierror in schema.getErrors ():
+                    print (" Warning: matching '{0}' exceeded the budget of {1} seconds and it has been considered to match no component".format (ierror, params.budget))
 
                 # execute also the tearDown
-                configFile.tearDown (zipstream)
+                if tearDownResult:
+                    hooks.tearDown (zipstream, schema.getResult ())
+                else:
+                    hooks.tearDown (zipstream)
 
                 # if requested, show a summary with all the information extracted
                 # from the zip file
                 if (params.show_summary):
-                    configFile.onSummary (zipstream)
+                    if onSummaryResult:
+                        hooks.onSummary (zipstream, schema.getResult ())
+                    else:
+                        hooks.onSummary (zipstream)
+
+        # if a required component is missing, the evaluation has been aborted
+        # before invoking any if-then function
+        except zwcschema.ZWCMissingError as error:
+            print (" Warning: {0}".format (error))
+            hooks.onAbort (ifile)
 
         # in case of SystemExit, there is nothing to do as that should usually
         # come from the configuration file aborting executing
         except SystemExit:
-            configFile.onAbort (ifile)
+            hooks.onAbort (ifile)
     
         # in case of error, invoke 'onError' with the string generated in the
         # exception
         except:
-            configFile.onError (sys.exc_info()[1], ifile)
+            hooks.onError (sys.exc_info()[1], ifile)
+
+    # record the statistics of this run, if requested
+    if stats and params.stats is not None:
+        schema.recordStats ()
+        stats.save ()
 
     # invoke the epilogue after the whole process
-    configFile.epilogue ()
+    hooks.epilogue ()
         
 
                 
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcactions.py
+# Description: built-in actions of schemas executed without invoking the
+#              configuration file
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+built-in actions of schemas executed without invoking the configuration file
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import os                       # path filesystem
+
+# functions
+# -----------------------------------------------------------------------------
+
+# every built-in action receives the current value of its result and the
+# content matched, and it returns the new value of the result
+
+# record that a component matched any content
+def flag (value, content):
+    """return True as a content has been matched"""
+
+    return True
+
+
+# count the contents matched by a component
+def count (value, content):
+    """return the number of contents matched, including this one"""
+
+    return value + 1
+
+
+# collect the contents matched by a component
+def collect (value, content):
+    """return the list of contents matched, including this one"""
+
+    value.append (content)
+    return value
+
+
+# collect the basename of the contents matched by a component
+def collectBasename (value, content):
+    """return the list with the basename of all contents matched, including this
+       one
+
+    """
+
+    value.append (os.path.basename (content))
+    return value
+
+
+# constants
+# -----------------------------------------------------------------------------
+
+# built-in actions that can be given instead of if-then functions, along with
+# the function used to create the initial value of their results
+ACTIONS = {
+    'flag': (bool, flag),
+    'count': (int, count),
+    'collect': (list, collect),
+    'collect-basename': (list, collectBasename)
+}
+
+# -----------------------------------------------------------------------------
+# ZWCResult
+#
+# Results of the built-in actions of a schema for a single zip file
+# -----------------------------------------------------------------------------
+class ZWCResult:
+    """Results of the built-in actions of a schema for a single zip file. Results
+       are accessed by the name of the components (see ZWCSchemaComponent),
+       e.g., result['part1Files']. Components which did not match any content
+       have the initial value of their action: False, 0 or an empty list
+
+    """
+
+    def __init__ (self, components):
+        """creates the results of the given components, instances of
+           ZWCSchemaComponent, with their initial values. Only components with
+           built-in actions are considered
+
+        """
+
+        self._values = dict ()
+        for icomponent in components:
+            action = icomponent.getAction ()
+            if action:
+                self._values[icomponent.getName ()] = ACTIONS[action][0] ()
+
+
+    def __str__ (self):
+        """return a human readable version of these results"""
+
+        return "\n".join (" {0}: {1}".format (name, value) for name, value in self._values.items ())
+
+
+    def __contains__ (self, name):
+        """return whether there is a result with the given name"""
+
+        return name in self._values
+
+
+    def __getitem__ (self, name):
+        """return the result with the given name. If there is none, KeyError is
+           raised
+
+        """
+
+        return self._values[name]
+
+
+    def get (self, name, default=None):
+        """return the result with the given name, or default if there is none"""
+
+        return self._values.get (name, default)
+
+
+    def record (self, name, function, content):
+        """record that the given content was matched by a component whose result
+           has the given name and whose built-in action is given as a function
+
+        """
+
+        self._values[name] = function (self._values[name], content)
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcanalysis.py
+# Description: static analysis of the regular expressions of schemas
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+static analysis of the regular expressions of schemas
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import re                       # matching regular expressions
+
+import zwcnfa
+
+# the parser of regular expressions is used for analyzing them. Since Python
+# 3.11 it is a private module of the re package
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# constants
+# -----------------------------------------------------------------------------
+
+# items of regular expressions which consume a single char
+CHARS = (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN)
+
+# repetitions which backtrack over their iterations
+REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+# items of regular expressions which consume no chars
+ZEROWIDTH = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+
+# chars used for deciding whether two items of regular expressions can match
+# the same char, besides those mentioned in the items: all chars of the latin-1
+# range and a few others from the categories of digits, words and spaces
+SAMPLES = [chr (ichar) for ichar in range (256)] + ["٠", "Ж", "中", " "]
+
+# functions
+# -----------------------------------------------------------------------------
+
+# return the items which can consume the first (or last) char of a match
+def boundaryItems (items, last=False):
+    """return a list with the items consuming a single char which can match the
+       first char of the strings matched by the given sequence of items of a
+       regular expression, as returned by its parser. If last is true, the items
+       which can match the last char are returned instead. None is returned if
+       they can not be determined
+
+    """
+
+    result = list ()
+    for op, av in (reversed (items) if last else items):
+
+        if op in CHARS:
+            result.append ((op, av))
+            return result
+
+        if op in ZEROWIDTH:
+            continue
+
+        # other items add the chars of their contents and stop the traversal
+        # unless they can match the empty string
+        if op == sre_parse.SUBPATTERN:
+            alternatives = [av[-1]]
+        elif op == sre_parse.BRANCH:
+            alternatives = av[1]
+        elif op in REPEATS:
+            alternatives = [av[2]]
+        else:
+            return None
+
+        for ialternative in alternatives:
+            items = boundaryItems (ialternative, last)
+            if items is None:
+                return None
+            result += items
+
+        if not zwcnfa.isNullable ([(op, av)]):
+            return result
+
+    return result
+
+
+# return all the items which can consume a char
+def charItems (items):
+    """return a list with all the items consuming a single char which appear in
+       the given sequence of items of a regular expression, as returned by its
+       parser. None is returned if they can not be determined
+
+    """
+
+    result = list ()
+    for op, av in items:
+
+        if op in CHARS:
+            result.append ((op, av))
+        elif op in ZEROWIDTH:
+            continue
+        elif op == sre_parse.SUBPATTERN:
+            alternatives = [av[-1]]
+        elif op == sre_parse.BRANCH:
+            alternatives = av[1]
+        elif op in REPEATS:
+            alternatives = [av[2]]
+        else:
+            return None
+
+        if op not in CHARS:
+            for ialternative in alternatives:
+                items = charItems (ialternative)
+                if items is None:
+                    return None
+                result += items
+
+    return result
+
+
+# return whether two lists of items can match the same char
+def overlap (items1, items2):
+    """return whether there is a char matched by an item in both lists of items
+       consuming a single char. Unknown lists (None) overlap with any other. The
+       decision is taken by sampling chars so that it might be wrong for
+       exotic classes
+
+    """
+
+    if items1 is None or items2 is None:
+        return True
+
+    # collect the chars mentioned by any item in addition to the samples
+    samples = list (SAMPLES)
+    for op, av in items1 + items2:
+        if op in (sre_parse.LITERAL, sre_parse.NOT_LITERAL):
+            samples.append (chr (av))
+        elif op == sre_parse.IN:
+            for iop, iav in av:
+                if iop == sre_parse.LITERAL:
+                    samples.append (chr (iav))
+                elif iop == sre_parse.RANGE:
+                    samples += [chr (iav[0]), chr (iav[1])]
+
+    try:
+        predicates1 = [zwcnfa.predicate (op, av, True) for op, av in items1]
+        predicates2 = [zwcnfa.predicate (op, av, True) for op, av in items2]
+    except zwcnfa.ZWCNFAError:
+        return True
+
+    for ichar in samples:
+        if any (ipredicate (ichar) for ipredicate in predicates1) and \
+           any (ipredicate (ichar) for ipredicate in predicates2):
+            return True
+
+    return False
+
+
+# return the shapes prone to catastrophic backtracking in a regular expression
+def backtrackingRisks (pattern):
+    """return a list with a description of all shapes of the given compiled
+       pattern which are prone to catastrophic backtracking, i.e., which might
+       take exponential time for matching strings that eventually fail. The
+       following shapes are acknowledged within unbounded repetitions:
+
+       * repetitions of variable length which can match the first and the last
+         char of an iteration, e.g., '(a+)+' or '(\\d+-?)*'
+
+       * alternatives which can match the same first char, e.g., '(ab|a.)*'
+
+       * alternatives which can match the empty string along with others that
+         can match the chars following them, e.g., '(aa|a)*' or '(x|x)*',
+         which the parser turns into 'a(a|)' and 'x(|)'
+
+       * consecutive repetitions of variable length which can match the same
+         chars, e.g., '(a*b?a*)+'
+
+       Note that the analysis might report harmless shapes
+
+    """
+
+    if not isinstance (pattern.pattern, str):
+        return []
+
+    try:
+        tree = sre_parse.parse (pattern.pattern, pattern.flags)
+    except (re.error, RecursionError):
+        return []
+
+    risks = list ()
+
+    def report (risk):
+        if risk not in risks:
+            risks.append (risk)
+
+    # return the repetitions of variable length that can match non-empty
+    # strings within the given items
+    def repetitions (items):
+        result = list ()
+        for op, av in items:
+            if op in REPEATS:
+                if av[1] > av[0] and not zwcnfa.isNullable (av[2]):
+                    result.append (av)
+                result += repetitions (av[2])
+            elif op == sre_parse.SUBPATTERN:
+                result += repetitions (av[-1])
+            elif op == sre_parse.BRANCH:
+                for ialternative in av[1]:
+                    result += repetitions (ialternative)
+        return result
+
+    # verify the body of an unbounded repetition
+    def verifyLoop (body):
+
+        # repetitions which can end an iteration and start the next one
+        (first, last) = (boundaryItems (body), boundaryItems (body, True))
+        for irepetition in repetitions (body):
+            chars = charItems (irepetition[2])
+            if overlap (chars, first) and overlap (chars, last):
+                report ("nested repetitions that can match the same chars")
+
+    # return the items which can consume the first char following the given
+    # items, when they are followed by those given in follow
+    def following (items, follow):
+        first = boundaryItems (items)
+        if first is None or follow is None:
+            return None
+        if zwcnfa.isNullable (items):
+            return first + follow
+        return first
+
+    # verify alternatives and consecutive repetitions within an unbounded
+    # repetition. Every repetition is compared with all the preceding ones which
+    # are separated from it by items that can match the empty string. The
+    # items which can consume the first char following the given ones are
+    # given in follow
+    def verifySequence (items, follow):
+
+        preceding = list ()
+        for position, (op, av) in enumerate (items):
+
+            # alternatives that can match the same first char
+            if op == sre_parse.BRANCH:
+                boundaries = [boundaryItems (ialternative) for ialternative in av[1]]
+                for i in range (len (boundaries)):
+                    for j in range (i + 1, len (boundaries)):
+                        if overlap (boundaries[i], boundaries[j]):
+                            report ("alternatives that can match the same chars within a repetition")
+
+                # and alternatives that can match the empty string, which the
+                # parser creates when it factors out the prefix shared by all
+                # alternatives, e.g., '(aa|a)*'. They are ambiguous if any
+                # other can match the same chars following them
+                nullable = [index for index, ialternative in enumerate (av[1]) if zwcnfa.isNullable (ialternative)]
+                if len (nullable) > 1:
+                    report ("alternatives that can match the same chars within a repetition")
+                elif nullable:
+                    after = following (items[position+1:], follow)
+                    if any (overlap (iboundaries, after)
+                            for index, iboundaries in enumerate (boundaries) if index not in nullable):
+                        report ("alternatives that can match the same chars within a repetition")
+
+            if op in REPEATS and av[1] > av[0]:
+                chars = charItems (av[2])
+                if any (overlap (ipreceding, chars) for ipreceding in preceding):
+                    report ("consecutive repetitions that can match the same chars within a repetition")
+                if zwcnfa.isNullable ([(op, av)]):
+                    preceding.append (chars)
+                else:
+                    preceding = [chars]
+            elif not zwcnfa.isNullable ([(op, av)]):
+                preceding = list ()
+
+    # traverse the whole tree recording whether the current items are within
+    # an unbounded repetition, and the items which can consume the first char
+    # following them, i.e., those following the items which contain them or,
+    # within repetitions, those starting another iteration as well
+    def traverse (items, loop, follow):
+
+        if loop:
+            verifySequence (items, follow)
+
+        for position, (op, av) in enumerate (items):
+            after = following (items[position+1:], follow)
+            if op in REPEATS:
+                if av[1] == sre_parse.MAXREPEAT:
+                    verifyLoop (av[2])
+                first = boundaryItems (av[2])
+                traverse (av[2], loop or av[1] == sre_parse.MAXREPEAT,
+                          None if first is None or after is None else first + after)
+            elif op == sre_parse.SUBPATTERN:
+                traverse (av[-1], loop, after)
+            elif op == sre_parse.BRANCH:
+                for ialternative in av[1]:
+                    traverse (ialternative, loop, after)
+
+    traverse (tree, False, [])
+
+    return risks
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwccompiler.py
+# Description: generation of python functions specialized in evaluating the
+#              contents of zip files against a given schema
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+generation of python functions specialized in evaluating the contents of zip
+files against a given schema
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import glob                     # unix filename pattern matching
+import hashlib                  # secure hashes
+import os                       # path filesystem
+import sys                      # system accessing
+
+import zwcmatcher
+import zwcversion
+
+# constants
+# -----------------------------------------------------------------------------
+
+# version of the generated code. Whenever it changes, all evaluators cached on
+# disk are generated anew
+GENERATOR_VERSION = 3
+
+# name of the directory, next to configuration files, where evaluators are
+# cached
+CACHE_DIRECTORY = "__zwccache__"
+
+# functions
+# -----------------------------------------------------------------------------
+
+# return the source code of the factory of evaluators of a schema
+def generate (schema, check=False):
+    """return the source code of a python function create (components,
+       functions, fullmatch, verify) which returns an evaluator specialized for
+       the given schema, an instance of ZWCSchema. The evaluator is a function
+       evaluate (schema, contents) equivalent to ZWCSchema.evaluate once the
+       parents of all components have been resolved and all required
+       components have been verified (see ZWCSchema.resolve), though it
+       matches all components in the order given by the plan of the schema and
+       with no cache. Components with a parent are skipped if they are
+       disabled when the evaluator is invoked. The factory receives the list of components of the
+       schema, the list with the if-then function of every component (or None),
+       the function matching the root of the schema and a function verify
+       (schema, content, index, groups) which is invoked with the index of the
+       component matched by every content and its named groups if check is
+       true
+
+    """
+
+    components = schema._components
+
+    # every component in the plan is bound to local variables of the factory
+    lines = ["# zipwatch evaluator generated for the configuration file '{0}'".format (schema._configFile.getConfigFile ()),
+             "# -----------------------------------------------------------------------------",
+             "# Do not edit: it is generated anew whenever the schema changes",
+             "",
+             "def create (components, functions, fullmatch, verify):",
+             "",
+             "    MISS = object ()",
+             "    roots = dict ()"]
+    for index in schema._plan:
+        lines += ["",
+                  "    # {0}".format (components[index].getName ().replace ("\n", "\\n")),
+                  "    component{0} = components[{0}]".format (index),
+                  "    match{0} = component{0}.getMatchFunction ()".format (index),
+                  "    regexp{0} = component{0}.getFullRegexp ()".format (index),
+                  "    ifthen{0} = functions[{0}]".format (index),
+                  "    (name{0}, action{0}) = (component{0}.getName (), component{0}._action)".format (index)]
+
+    # the evaluator matches the root only once per top-level directory, and
+    # remembers at most ROOTS_SIZE directories, as ZWCRootMatcher does. The
+    # number of attempts is recorded even if any function aborts the
+    # evaluation. Components which can be disabled, i.e., those with a parent,
+    # are matched only if they are enabled
+    root = any (components[index].getRoot () for index in schema._plan)
+    lines += ["",
+              "    def evaluate (schema, contents):",
+              "",
+              "        (zipstream, hits, record, attempts) = (schema._zipstream, schema._hits, schema._result.record, 0)"]
+    for index in schema._plan:
+        if index in schema._parents:
+            lines += ["        enabled{0} = {0} not in schema._disabled".format (index)]
+    lines += ["        try:",
+              "            for content in schema.verifiedContents (contents):",
+              "",
+              "                attempts += 1"]
+    if root:
+        lines += ["",
+                  "                # match the root against the top-level directory",
+                  "                (rest, rootgroups, slash) = (None, None, content.find ('/'))",
+                  "                if slash != -1:",
+                  "                    top = content[:slash+1]",
+                  "                    rootgroups = roots.get (top, MISS)",
+                  "                    if rootgroups is MISS:",
+                  "                        if len (roots) >= {0}:".format (zwcmatcher.ROOTS_SIZE),
+                  "                            roots.clear ()",
+                  "                        m = fullmatch (top)",
+                  "                        rootgroups = roots[top] = m.groupdict () if m else None",
+                  "                    if rootgroups is not None:",
+                  "                        rest = content[slash+1:]"]
+
+    # and then every component in order. Consecutive relative components are
+    # matched only if the root matched
+    relative = False
+    for index in schema._plan:
+
+        component = components[index]
+        if relative and not component.getRoot ():
+            relative = False
+        indent = " " * 20 if component.getRoot () else " " * 16
+        if component.getRoot () and not relative:
+            relative = True
+            lines += ["", "                if rest is not None:"]
+
+        # the named groups are computed only if they are required
+        groups = check or component.isBatch () or component._groups
+        lines += ["",
+                  indent + "# [{0}] {1}".format (index, component.getName ().replace ("\n", "\\n")),
+                  indent + "m = {0}match{1} ({2})".format ("enabled{0} and ".format (index) if index in schema._parents else "",
+                                                         index, "rest" if component.getRoot () else "content"),
+                  indent + "if m:",
+                  indent + "    hits[{0}] += 1".format (index),
+                  indent + "    component{0}._matches += 1".format (index)]
+        if groups and component.getRoot ():
+            lines += [indent + "    groups = dict (rootgroups)",
+                      indent + "    groups.update (m.groupdict ())"]
+        elif groups:
+            lines += [indent + "    groups = m.groupdict ()"]
+        if check:
+            lines += [indent + "    verify (schema, content, {0}, groups)".format (index)]
+        if component._action:
+            lines += [indent + "    record (name{0}, action{0}, content)".format (index)]
+        elif component._if_then and component.isBatch ():
+            lines += [indent + "    component{0}.collect (content, groups)".format (index)]
+        elif component._if_then:
+            lines += [indent + "    ifthen{0} (zipstream, regexp{0}, content, component{0}._matches{1})".format (index, ", groups" if component._groups else "")]
+        lines += [indent + "    continue"]
+
+    # contents matching no component are verified as well
+    if check:
+        lines += ["", "                verify (schema, content, None, None)"]
+
+    lines += ["",
+              "        finally:",
+              "            schema._attempts += attempts",
+              "",
+              "        # invoke the batch if-then functions and the if-else functions",
+              "        schema.executeIfThenBatch ()",
+              "        schema.executeIfElse ()",
+              "",
+              "    return evaluate",
+              ""]
+
+    return "\n".join (lines)
+
+
+# verify the component matched by a content
+def verify (schema, content, index, groups):
+    """verify that the component with the given index (or None) and the named
+       groups are the same than those given by the matcher of the schema for
+       the given content. Otherwise, a fatal error is raised
+
+    """
+
+    result = schema._matcher.match (content)
+    expected = (schema._positions[result[0]], schema._matcher.groups (*result)) if result else (None, None)
+    if expected != (index, groups):
+        print (" Fatal error: the compiled evaluator matched '{0}' with the component {1} {2} whereas the reference evaluator matched it with the component {3} {4}".format (content, index, groups, *expected))
+        sys.exit (1)
+
+
+# return a hash of the configuration file and the schema
+def fingerprint (schema, check=False):
+    """return a string with a hash of the configuration file of the given schema,
+       and all the information used for generating its evaluator
+
+    """
+
+    digest = hashlib.sha256 ()
+    with open (schema._configFile.getPath (), "rb") as stream:
+        digest.update (stream.read ())
+    digest.update (repr ((GENERATOR_VERSION, zwcversion.__version__, check, schema._plan,
+                          zwcmatcher.fingerprint (schema._components),
+                          [(icomponent._if_then, icomponent._groups, icomponent.isBatch (), icomponent.getName ())
+                           for icomponent in schema._components])).encode ())
+
+    return digest.hexdigest ()
+
+
+# return the factory of evaluators specialized for a schema
+def factory (schema, check=False):
+    """return the function create (components, functions, fullmatch, verify)
+       which returns evaluators specialized for the given schema, an instance
+       of ZWCSchema (see generate). Its source code is cached in a directory
+       next to the configuration file of the schema, named after a hash of the
+       configuration file and the schema, so that it is generated only once,
+       and only the last one is kept. If the cache can not be written, a
+       warning is shown and the source code is used anyway
+
+    """
+
+    configFile = schema._configFile
+    directory = os.path.join (os.path.dirname (configFile.getPath ()), CACHE_DIRECTORY)
+    filename = os.path.join (directory, "{0}-{1}.py".format (configFile.getNamespace (), fingerprint (schema, check)[:16]))
+
+    # read the source code from the cache, if it is there, or generate it
+    # otherwise
+    try:
+        with open (filename) as stream:
+            source = stream.read ()
+    except OSError:
+        source = generate (schema, check)
+        try:
+            os.makedirs (directory, exist_ok=True)
+            with open (filename + ".tmp", "w") as stream:
+                stream.write (source)
+            os.replace (filename + ".tmp", filename)
+
+            # evaluators generated before for the same configuration file are
+            # removed, as it or its plan changed
+            for ifile in glob.glob (os.path.join (directory, "{0}-*.py".format (configFile.getNamespace ()))):
+                if ifile != filename:
+                    os.remove (ifile)
+        except OSError as error:
+            print (" Warning: the compiled evaluator could not be cached in '{0}': {1}".format (filename, error))
+
+    namespace = dict ()
+    exec (compile (source, filename, "exec"), namespace)
+
+    return namespace['create']
+
+
+# return an evaluator specialized for a schema
+def evaluator (schema, create):
+    """return a function evaluate (schema, contents) specialized for the given
+       schema, an instance of ZWCSchema, created with the given factory (see
+       factory) from the components of the schema and their functions. Thus,
+       copies of the same schema can create their own evaluators with the
+       same factory
+
+    """
+
+    functions = [icomponent._then for icomponent in schema._components]
+    root = next ((icomponent.getRoot () for icomponent in schema._components if icomponent.getRoot ()), None)
+
+    return create (schema._components, functions, root and root.fullmatch, verify)
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
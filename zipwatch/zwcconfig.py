@@ -14,12 +14,50 @@ Configuration files
 
 # imports
 # -----------------------------------------------------------------------------
-import inspect                  # introspective analysis of python modules
+import importlib.machinery      # loaders of python modules
+import importlib.util           # import utilities
 import os                       # file handling
 import re                       # matching regular expressions
 import sys                      # system accessing
+import types                    # types of functions
 
-from pathlib import Path        # path handling
+# note that modules which take long to be imported (e.g., inspect or pathlib)
+# are avoided, as they delay every invocation of zipwatch
+
+import zwcactions               # built-in actions
+import zwcanalysis              # static analysis of regular expressions
+
+# constants
+# -----------------------------------------------------------------------------
+
+# functions of configuration files invoked by zipwatch along the whole process
+# rather than by the components of schemas
+HOOKS = ('preamble', 'setUp', 'tearDown', 'epilogue', 'onSummary', 'onError', 'onAbort')
+
+# -----------------------------------------------------------------------------
+# ZWCHooks
+#
+# Table with the lifecycle functions of a configuration file
+# -----------------------------------------------------------------------------
+class ZWCHooks:
+    """Table with the lifecycle functions of a configuration file (see HOOKS),
+       e.g., hooks.setUp (zipstream). They are resolved only once, so that
+       invoking them is just a function call. Those which are not defined in
+       the configuration file are the identity function
+
+    """
+
+    __slots__ = HOOKS
+
+    def __init__ (self, configFile):
+        """resolves all the lifecycle functions of the given configuration file,
+           an instance of ZWCConfigFile
+
+        """
+
+        for ihook in HOOKS:
+            function = configFile.getAttribute (ihook)
+            setattr (self, ihook, function if isinstance (function, types.FunctionType) else configFile.id)
 
 
 # -----------------------------------------------------------------------------
@@ -33,19 +71,25 @@ class ZWCConfigFile:
     """
 
     def __init__ (self, configFile):
-        """registers a configuration file to be used with zipwatch"""
+        """registers a configuration file to be used with zipwatch. It can be given
+           either as the path to a python file, or as a resource of an
+           installed package with the syntax 'package:filename', e.g.,
+           'zipwatch:conf1.py'. The configuration file is loaded only once,
+           whatever its location, and its module is used directly afterwards
+
+        """
 
         # copy the attributes
         self._config = configFile
 
+        # and initialize the functions resolved so far and the warnings shown
+        (self._functions, self._warnings) = (dict (), set ())
+
         # now, check it exists and if it does then access its namespace
-        pathconfig = Path (configFile)
+        self._path = os.path.realpath (ZWCConfigFile.locate (configFile))
 
         # verify the file exists and it is accessible
-        try:
-            my_abs_path = pathconfig.resolve (strict=True)
-
-        except FileNotFoundError:
+        if not os.path.isfile (self._path):
 
             # if it does not exist
             print ("Fatal error: the file '{0}' does not exist or it is not accessible".format (configFile))
@@ -53,8 +97,77 @@ class ZWCConfigFile:
 
         else:
 
-            # yeah, it exists, get then its namespace name
-            self._namespace = inspect.getmodulename (configFile)
+            # yeah, it exists, get then its namespace name and load it
+            self._namespace = os.path.splitext (os.path.basename (self._path))[0]
+            self._module = ZWCConfigFile.load (self._namespace, self._path)
+
+            # and resolve all its lifecycle functions
+            self._hooks = ZWCHooks (self)
+
+
+    @staticmethod
+    def locate (configFile):
+        """return the path to the given configuration file. If it is given as a
+           resource of a package, 'package:filename', and there is no file with
+           that name, the path to the resource within the package is returned
+           instead. If the package is not found, a fatal error is raised
+
+        """
+
+        (package, colon, resource) = configFile.partition (':')
+        if not colon or os.path.exists (configFile) or \
+           not all (ipart.isidentifier () for ipart in package.split ('.')):
+            return configFile
+
+        try:
+            spec = importlib.util.find_spec (package)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None or not spec.submodule_search_locations:
+            print (" Fatal error: the package '{0}' of the configuration file '{1}' has not been found".format (package, configFile))
+            sys.exit (1)
+
+        return os.path.join (list (spec.submodule_search_locations)[0], resource)
+
+
+    @staticmethod
+    def load (namespace, path):
+        """return the module with the given name loaded from the python file with
+           the given path. It is registered in sys.modules under its name,
+           unless another module is already imported or importable with it,
+           so that the same configuration file is loaded only once and its
+           functions can be pickled. If it can not be loaded, a fatal error is
+           raised
+
+        """
+
+        # configuration files already loaded are reused
+        module = sys.modules.get (namespace)
+        if module is not None and getattr (module, '__file__', None) and \
+           os.path.realpath (module.__file__) == os.path.realpath (path):
+            return module
+
+        loader = importlib.machinery.SourceFileLoader (namespace, path)
+        spec = importlib.util.spec_from_file_location (namespace, path, loader=loader)
+        module = importlib.util.module_from_spec (spec)
+        try:
+            other = importlib.util.find_spec (namespace)
+        except (ImportError, ValueError):
+            other = None
+        registered = namespace not in sys.modules and \
+            (other is None or os.path.realpath (other.origin or "") == os.path.realpath (path))
+        if registered:
+            sys.modules[namespace] = module
+        try:
+            loader.exec_module (module)
+        except Exception as error:
+            if registered:
+                del sys.modules[namespace]
+            print (" Fatal error: the configuration file '{0}' could not be loaded: {1}".format (path, error))
+            sys.exit (1)
+
+        return module
+
 
     def __getattr__ (self, key):
         """return the function named after key implemented in the configuration file. In
@@ -62,12 +175,21 @@ class ZWCConfigFile:
 
         """
 
+        # lifecycle functions are taken from the table of hooks, if it has been
+        # already created
+        if key in HOOKS and '_hooks' in self.__dict__:
+            return getattr (self._hooks, key)
+
+        # attributes of this instance which have not been initialized yet are
+        # not looked up in the configuration file
+        if '_module' not in self.__dict__:
+            raise AttributeError (key)
+
         # check first whether key is defined as a function in the configuration file
         if self.checkFunction (key):
 
             # then return the function
-            command = """func = {0}.__dict__['{1}']""".format (self._namespace, key)
-            return self.execute (command) ['func']
+            return getattr (self._module, key)
 
         # else invoke the identity function
         else:
@@ -84,8 +206,29 @@ class ZWCConfigFile:
         """return the namespace of this configuration file"""
 
         return self._namespace
+
+
+    def getPath (self):
+        """return the absolute path to this configuration file"""
+
+        return self._path
+
+
+    def getModule (self):
+        """return the module loaded from this configuration file"""
+
+        return self._module
     
         
+    def getHooks (self):
+        """return the table with the lifecycle functions of this configuration
+           file, an instance of ZWCHooks
+
+        """
+
+        return self._hooks
+
+
     def getList (self, component):
         """return the contents of the specified component from this configuration
            file. The component should exist, and it should be defined as a list;
@@ -93,9 +236,42 @@ class ZWCConfigFile:
 
         """
 
-        # create python statements and execute them within an empty context
-        command = """lstHandler = {0}.{1}""".format (self._namespace, component)
-        return self.execute (command) ["lstHandler"]
+        return getattr (self._module, component)
+
+
+    def getAttribute (self, component, default=None):
+        """return the value of the specified component from this configuration
+           file, or the given default value if it is not defined
+
+        """
+
+        return getattr (self._module, component, default)
+
+
+    def getFunction (self, name):
+        """return the function with the given name implemented in this
+           configuration file, or None if it is not defined. Functions are
+           resolved only once, either when verifying this configuration file
+           or the first time they are requested, so that they can be invoked
+           directly afterwards
+
+        """
+
+        if name not in self._functions:
+            self._functions[name] = self.getAttribute (name)
+
+        return self._functions[name]
+
+
+    def warn (self, message):
+        """show the given warning about this configuration file, unless it was
+           already shown, e.g., when creating another schema from it
+
+        """
+
+        if message not in self._warnings:
+            self._warnings.add (message)
+            print (" Warning: {0}".format (message))
 
 
     def id (self, *kwargs):
@@ -111,14 +287,7 @@ class ZWCConfigFile:
     def checkList (self, component):
         """verifies that the given component is defined in this configuration file as a list"""
 
-        # create python statements and execute them within an empty context
-        command = """{1}_exists = hasattr({0}, \"{1}\")
-{1}_is_a_list = {1}_exists and isinstance ({0}.{1}, list)""".format (self._namespace, component)
-        context = self.execute (command)
-
-        # now, retrive from the context whether: first, the component exists and
-        # second, it is defined as a list
-        return context["{0}_is_a_list".format (component)]
+        return isinstance (getattr (self._module, component, None), list)
         
 
     def checkFunction (self, component):
@@ -126,17 +295,44 @@ class ZWCConfigFile:
 
         """
 
-        # create python statements and execute them within an empty context
-        command = """import inspect
-{1}_exists = hasattr({0}, \"{1}\")
-{1}_is_function = {1}_exists and inspect.isfunction ({0}.{1})""".format (self._namespace, component)
-        context = self.execute (command)
-
-        # now, retrive from the context whether: first, the component exists and
-        # second, it is defined as a function
-        return context["{0}_exists".format (component)] and context["{0}_is_function".format (component)]
+        return isinstance (getattr (self._module, component, None), types.FunctionType)
     
 
+    def acceptsArguments (self, component, nbargs):
+        """verifies the given component names a function defined in this configuration
+           file which can be invoked with the given number of positional
+           arguments
+
+        """
+
+        if not self.checkFunction (component):
+            return False
+
+        # functions wrapping others (e.g., decorated with functools.wraps) are
+        # examined with their signature. This is the only case where inspect
+        # is imported, as it takes long
+        function = getattr (self._module, component)
+        if hasattr (function, '__wrapped__'):
+            import inspect
+            try:
+                inspect.signature (function).bind (*range (nbargs))
+            except TypeError:
+                return False
+            return True
+
+        # otherwise, the number of positional parameters is taken from its code,
+        # along with those which have default values. Keyword-only parameters
+        # should have default values as well
+        code = function.__code__
+        (positional, defaults) = (code.co_argcount, len (function.__defaults__ or ()))
+        if set (code.co_varnames[positional:positional + code.co_kwonlyargcount]) - set (function.__kwdefaults__ or ()):
+            return False
+
+        # note that 0x04 is the flag of functions with a variable number of
+        # positional parameters, CO_VARARGS
+        return positional - defaults <= nbargs and (nbargs <= positional or bool (code.co_flags & 0x04))
+
+
     def verify (self):
         """verifies the contents of this configFile, i.e., that all necessary functions
            and data structures are given.
@@ -151,8 +347,20 @@ class ZWCConfigFile:
                 onAbort
                 onError
 
-                In addition, all if-then and if-else functions registered in the
-                schema should be given in this configuration file
+                In addition, all if-then, if-else and violation functions
+                registered in the schema should be given in this configuration
+                file, unless if-then functions are the name of built-in actions
+
+           The following items are optional:
+
+           * Regular expressions:
+                contentRoot - With the root directory of all contents
+
+           Regular expressions of the schema prone to catastrophic backtracking
+           are reported with a warning
+
+           All if-then, if-else and violation functions of the schema are
+           resolved once verified (see getFunction)
 
         """
 
@@ -164,22 +372,63 @@ class ZWCConfigFile:
         # verify that all functions given in the schema specification are also implemented
         for ischema in self.getList ("contentSpec"):
 
-            if len (ischema) != 3:
+            if len (ischema) not in (3, 4):
                 print (" Fatal error: the schema '{0}' from 'contentSpec' has an incorrect number of arguments".format (ischema))
                 sys.exit (1)
 
-            # note that while the schema should consist of precisely three
+            # the fourth argument, if given, should be a dictionary of options
+            if len (ischema) == 4 and not isinstance (ischema[3], dict):
+                print (" Fatal error: the options of the schema '{0}' from 'contentSpec' have not been given as a dictionary".format (ischema))
+                sys.exit (1)
+
+            # verify the regular expression can be compiled (note that
+            # re.compile returns precompiled patterns as they are) so that
+            # incorrect patterns are reported before processing any zip file
+            try:
+                pattern = re.compile (ischema[0])
+            except (re.error, TypeError) as error:
+                print (" Fatal error: the regular expression '{0}' from 'contentSpec' is not correct: {1}".format (ischema[0], error))
+                sys.exit (1)
+
+            # and warn about those which are prone to catastrophic backtracking,
+            # as a single content might then take forever to be matched
+            for irisk in zwcanalysis.backtrackingRisks (pattern):
+                print (" Warning: the regular expression '{0}' from 'contentSpec' is prone to catastrophic backtracking: {1}. Consider using the linear backend or a matching budget".format (pattern.pattern, irisk))
+
+            # note that while the schema should consist of at least three
             # arguments, it is possible to give the empty string as an if-then
-            # function
-            if ischema[1] and not self.checkFunction (ischema[1]):
+            # function. It can be also given the name of a built-in action
+            if ischema[1] and ischema[1] not in zwcactions.ACTIONS and not self.checkFunction (ischema[1]):
                 print (" Fatal error: the if-then function '{0}' has not been found in module '{1}'".format (ischema[1], self._config))
                 sys.exit (1)
+            if ischema[1] and ischema[1] not in zwcactions.ACTIONS:
+                self.getFunction (ischema[1])
 
             # likewise, it is also allowed to specify the empty string as an else
             # function
             if ischema[2] and not self.checkFunction (ischema[2]):
                 print (" Fatal error: the if-else function '{0}' has not been found in module '{1}'".format (ischema[2], self._config))
                 sys.exit (1)
+            if ischema[2]:
+                self.getFunction (ischema[2])
+
+            # and the same applies to the violation function, if any is given
+            # among the options
+            violation = ischema[3].get ('violation') if len (ischema) == 4 else None
+            if violation and not self.checkFunction (violation):
+                print (" Fatal error: the violation function '{0}' has not been found in module '{1}'".format (violation, self._config))
+                sys.exit (1)
+            if violation:
+                self.getFunction (violation)
+
+        # verify that the regular expression of the root, if any, can be compiled
+        root = self.getAttribute ("contentRoot")
+        if root is not None:
+            try:
+                re.compile (root)
+            except (re.error, TypeError) as error:
+                print (" Fatal error: the regular expression '{0}' from 'contentRoot' is not correct: {1}".format (root, error))
+                sys.exit (1)
 
         # check the existence of the mandatory functions
         for icomponent in ["onSummary", "onError", "onAbort"]:
@@ -189,16 +438,19 @@ class ZWCConfigFile:
                 sys.exit (1)
     
 
-    def execute (self, command, context=dict ()):
+    def execute (self, command, context=None):
         """executes the given comman within the given context. It returns the resulting
-               context
+               context. If no context is given, the command is executed within
+               a new one, so that commands never share their variables, and
+               this configuration file can be used by different threads
         
         """
 
-        # just execute the given command within the configuration file by
-        # prepending an import statement to it and return the resulting context
-        command = """import {0}
-{1}""".format (self._namespace, command)
+        context = dict () if context is None else context
+
+        # just execute the given command with the module of the configuration
+        # file accessible under its namespace and return the resulting context
+        context[self._namespace] = self._module
         exec (command, context)
         
         return context
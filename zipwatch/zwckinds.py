@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwckinds.py
+# Description: typed components of schemas which are resolved with indices
+#              instead of regular expressions
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+typed components of schemas which are resolved with indices instead of regular
+expressions
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import abc                      # abstract base classes
+import bisect                   # binary search over sorted lists
+import fnmatch                  # unix filename pattern matching
+import re                       # matching regular expressions
+import sys                      # system accessing
+
+# constants
+# -----------------------------------------------------------------------------
+
+# chars with a special meaning in unix filename patterns
+WILDCARDS = "*?["
+
+# -----------------------------------------------------------------------------
+# ZWCKind
+#
+# Definition of a typed component
+# -----------------------------------------------------------------------------
+class ZWCKind (str, metaclass=abc.ABCMeta):
+    """Definition of a typed component. Typed components are given in the schema
+       instead of regular expressions. They are strings with the regular
+       expression equivalent to them so that they can be used wherever regular
+       expressions are expected (e.g., with re.match in if-then functions), but
+       schemas resolve them with indices instead. Every kind of typed component
+       is a subclass which defines translate
+
+    """
+
+    def __new__ (cls, text):
+        """creates a new typed component from the given text"""
+
+        # note that str does not verify that abstract classes are not
+        # instantiated
+        if cls.__abstractmethods__:
+            raise TypeError ("Can't instantiate abstract class {0} with abstract method translate".format (cls.__name__))
+
+        if not isinstance (text, str):
+            print (" Fatal error: the {0} component '{1}' has not been given as a string".format (cls.__name__, text))
+            sys.exit (1)
+
+        kind = str.__new__ (cls, cls.translate (text))
+        kind._text = text
+        return kind
+
+
+    def __repr__ (self):
+        """return a human readable version of this typed component"""
+
+        return "{0} ({1!r})".format (type (self).__name__, self._text)
+
+
+    def getText (self):
+        """return the text this typed component was created from"""
+
+        return self._text
+
+
+    @staticmethod
+    @abc.abstractmethod
+    def translate (text):
+        """return the regular expression equivalent to a typed component created
+           from the given text
+
+        """
+
+        pass
+
+
+# -----------------------------------------------------------------------------
+# Exact
+#
+# Typed component matching contents equal to a given path
+# -----------------------------------------------------------------------------
+class Exact (ZWCKind):
+    """Typed component matching contents equal to a given path"""
+
+    @staticmethod
+    def translate (text):
+        """return the regular expression equivalent to this typed component"""
+
+        return re.escape (text) + r"\Z"
+
+
+# -----------------------------------------------------------------------------
+# Prefix
+#
+# Typed component matching contents starting with a given path
+# -----------------------------------------------------------------------------
+class Prefix (ZWCKind):
+    """Typed component matching contents starting with a given path, e.g., a
+       directory and all its contents
+
+    """
+
+    @staticmethod
+    def translate (text):
+        """return the regular expression equivalent to this typed component"""
+
+        return re.escape (text)
+
+
+# -----------------------------------------------------------------------------
+# Suffix
+#
+# Typed component matching contents ending with a given string
+# -----------------------------------------------------------------------------
+class Suffix (ZWCKind):
+    """Typed component matching contents ending with a given string, e.g., an
+       extension
+
+    """
+
+    @staticmethod
+    def translate (text):
+        """return the regular expression equivalent to this typed component"""
+
+        return r"(?s:.*)" + re.escape (text) + r"\Z"
+
+
+# -----------------------------------------------------------------------------
+# Glob
+#
+# Typed component matching contents with a unix filename pattern
+# -----------------------------------------------------------------------------
+class Glob (ZWCKind):
+    """Typed component matching contents with a unix filename pattern, as in
+       fnmatch.fnmatchcase. Note that wildcards also match slashes
+
+    """
+
+    @staticmethod
+    def translate (text):
+        """return the regular expression equivalent to this typed component"""
+
+        return fnmatch.translate (text)
+
+
+    def getPrefix (self):
+        """return the literal prefix of this pattern, i.e., all chars before the
+           first wildcard
+
+        """
+
+        for index, char in enumerate (self._text):
+            if char in WILDCARDS:
+                return self._text[:index]
+
+        return self._text
+
+
+# -----------------------------------------------------------------------------
+# ZWCPrefixIndex
+#
+# Index of strings which finds all those that are a prefix of another
+# -----------------------------------------------------------------------------
+class ZWCPrefixIndex:
+    """Index of strings (keys) with values which finds all keys that are a prefix
+       of a given string in logarithmic time in the number of keys (plus the
+       number of keys found)
+
+    """
+
+    def __init__ (self, pairs):
+        """creates an index with all the given pairs (key, value). Different values
+           can be given for the same key
+
+        """
+
+        # sort all keys and gather the values of each one
+        self._values = dict ()
+        for key, value in pairs:
+            self._values.setdefault (key, list ()).append (value)
+        self._keys = sorted (self._values)
+
+        # compute the parent of every key, i.e., the position of the longest
+        # key which is a proper prefix of it (or -1 if there is none). As keys
+        # are sorted, all prefixes of a key precede it, so that the ancestors of
+        # the current key are kept in a stack
+        (self._parents, stack) = (list (), list ())
+        for index, key in enumerate (self._keys):
+            while stack and not key.startswith (self._keys[stack[-1]]):
+                stack.pop ()
+            self._parents.append (stack[-1] if stack else -1)
+            stack.append (index)
+
+
+    def lookup (self, string):
+        """return a list with the values of all keys which are a prefix of the given
+           string, from the longest key to the shortest one
+
+        """
+
+        # the longest key which is a prefix of the string is either the last key
+        # which is not greater than it, or one of its ancestors
+        index = bisect.bisect_right (self._keys, string) - 1
+        while index >= 0 and not string.startswith (self._keys[index]):
+            index = self._parents[index]
+
+        # and all the other ones are its ancestors
+        result = list ()
+        while index >= 0:
+            result += self._values[self._keys[index]]
+            index = self._parents[index]
+
+        return result
+
+
+# -----------------------------------------------------------------------------
+# ZWCKindMatcher
+#
+# Matches contents against typed components with indices and against the other
+# components with a matching engine
+# -----------------------------------------------------------------------------
+class ZWCKindMatcher:
+    """Matches contents against typed components with indices and against the
+       other components with a matching engine. Exact paths are resolved with a
+       hash table, prefixes and suffixes with binary search, and unix filename
+       patterns are only matched if their literal prefix is found. The first
+       component that matches a content wins, whatever its kind
+
+    """
+
+    def __init__ (self, components, engine):
+        """creates a matcher for the given list of components, instances of
+           ZWCSchemaComponent, whose order is preserved. Components which are
+           not typed are matched with an instance of the given engine, one of
+           those in zwcmatcher.engines
+
+        """
+
+        self._components = components
+
+        # index all typed components
+        (self._exact, prefixes, suffixes, globs, self._positions) = (dict (), [], [], [], [])
+        for index, icomponent in enumerate (components):
+            kind = icomponent.getRegexp ()
+            if isinstance (kind, Exact):
+                self._exact.setdefault (kind.getText (), index)
+            elif isinstance (kind, Prefix):
+                prefixes.append ((kind.getText (), index))
+            elif isinstance (kind, Suffix):
+                suffixes.append ((kind.getText ()[::-1], index))
+            elif isinstance (kind, Glob):
+                globs.append ((kind.getPrefix (), index))
+            else:
+                self._positions.append (index)
+        (self._prefixes, self._suffixes, self._globs) = \
+            (ZWCPrefixIndex (prefixes), ZWCPrefixIndex (suffixes), ZWCPrefixIndex (globs))
+
+        # and create the engine for all the other components. Their positions
+        # in the schema are stored in ascending order
+        self._engine = None
+        if self._positions:
+            self._engine = engine ([components[index] for index in self._positions])
+
+
+    def __str__ (self):
+        """return a human readable version of this matcher"""
+
+        return "{0} and indices for {1} typed components".format (self._engine or "no engine",
+                                                                 len (self._components) - len (self._positions))
+
+
+    def match (self, content):
+        """return a tuple (index, m) with the index of the first component matching
+           the given content and the match object, or None if no component
+           matches it
+
+        """
+
+        # find the first typed component matching this content, if any
+        index = self._exact.get (content)
+        for icandidate in self._prefixes.lookup (content) + self._suffixes.lookup (content[::-1]):
+            if index is None or icandidate < index:
+                index = icandidate
+
+        # globs are matched only if they can improve the current index
+        for icandidate in sorted (self._globs.lookup (content)):
+            if index is not None and icandidate > index:
+                break
+            if self._components[icandidate].getMatchFunction () (content):
+                index = icandidate
+                break
+
+        # the other components are matched only if any precedes this one
+        if self._engine and (index is None or self._positions[0] < index):
+            result = self._engine.match (content)
+            if result and (index is None or self._positions[result[0]] < index):
+                return (self._positions[result[0]], result[1])
+
+        if index is None:
+            return None
+
+        return (index, self._components[index].getMatchFunction () (content))
+
+
+    def groups (self, index, m):
+        """return a dictionary with all named groups of the component with the given
+           index from the match object returned by match
+
+        """
+
+        position = bisect.bisect_left (self._positions, index)
+        if position < len (self._positions) and self._positions[position] == index:
+            return self._engine.groups (position, m)
+
+        return m.groupdict ()
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -0,0 +1,764 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcmatcher.py
+# Description: matching engines used to find the component of a schema matched
+#              by each content of a zip file
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+matching engines used to find the component of a schema matched by each content
+of a zip file
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import collections              # ordered dictionaries
+import threading                # locks
+import re                       # matching regular expressions
+
+# the parser of regular expressions is used for analyzing them. Since Python
+# 3.11 it is a private module of the re package
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# constants
+# -----------------------------------------------------------------------------
+
+# prefix used for naming the groups of combined regular expressions
+TAG_PREFIX = "_zwc"
+
+# flags of regular expressions compiled from strings with no flags
+DEFAULT_FLAGS = re.compile ("").flags
+
+# number of contents whose matching is cached when caches are enabled. They
+# are disabled by default, as looking up and storing every content costs
+# about as much as matching it against a small schema, so that they only pay
+# off when many contents are repeated across zip files or matching them is
+# expensive
+CACHE_SIZE = 10000
+
+# maximum number of caches shared by schemas with different components. Once
+# there are more, the least recently requested one is discarded
+MAX_CACHES = 16
+
+# maximum number of top-level directories whose match with the root is
+# remembered. Once there are more, all of them are forgotten
+ROOTS_SIZE = 10000
+
+# maximum number of components combined in a single regular expression by the
+# alternation engine. The re module saves the marks of all groups when trying
+# every alternative, so that the cost of a combined regular expression grows
+# quadratically with its number of alternatives. With 200 components, each one
+# with a named group, blocks of 16 components are 3.5 times faster than the
+# sequential engine, whereas a single block is 1.6 times slower
+BLOCK_SIZE = 16
+
+# minimum number of components matched by the prefilter engine. As contents are
+# scanned char by char in Python, it pays off only when many components are
+# discarded with every scan. With conf1, it is twice as slow as the sequential
+# engine, and it is faster only with about 30 components or more. Fewer
+# components are matched sequentially instead
+PREFILTER_SIZE = 32
+
+# result returned by caches for contents which are not cached. Note that None
+# is a legal result as it is cached for contents which match no component
+MISS = object ()
+
+# functions
+# -----------------------------------------------------------------------------
+
+# return the given pattern with all its named groups renamed
+def renameGroups (pattern, prefix):
+    """return the given pattern (a string) with all its named groups and named
+       backreferences prefixed with the given prefix. Escaped characters and
+       character classes are not modified
+
+    """
+
+    result = ""
+    (index, length) = (0, len (pattern))
+    while index < length:
+
+        # escaped characters are copied verbatim
+        if pattern[index] == '\\':
+            result += pattern[index:index+2]
+            index += 2
+
+        # as well as character classes. Note that the closing bracket is
+        # taken literally if it is the first char of the class
+        elif pattern[index] == '[':
+            end = index + 1
+            if end < length and pattern[end] == '^':
+                end += 1
+            if end < length and pattern[end] == ']':
+                end += 1
+            while end < length and pattern[end] != ']':
+                end += 2 if pattern[end] == '\\' else 1
+            result += pattern[index:end+1]
+            index = end + 1
+
+        # named groups and named backreferences are prefixed
+        elif pattern.startswith ("(?P<", index) or pattern.startswith ("(?P=", index):
+            result += pattern[index:index+4] + prefix
+            index += 4
+
+        else:
+            result += pattern[index]
+            index += 1
+
+    return result
+
+
+# return the literals required by the given pattern
+def requiredLiterals (pattern):
+    """return a list with the literal strings that appear in every string matched
+       by the given compiled pattern. Only literals that can be proven to be
+       mandatory are returned, so that the list might be empty
+
+    """
+
+    # case-insensitive patterns do not match literals verbatim
+    if not isinstance (pattern.pattern, str) or pattern.flags & re.IGNORECASE:
+        return []
+
+    try:
+        tree = sre_parse.parse (pattern.pattern, pattern.flags)
+    except (re.error, RecursionError):
+        return []
+
+    # traverse the tree of the regular expression accumulating consecutive
+    # literals into the current run. Any item that matches something other than
+    # a literal closes the current run
+    (literals, run) = ([], [""])
+
+    def close ():
+        if run[0]:
+            literals.append (run[0])
+        run[0] = ""
+
+    def traverse (items):
+        for op, av in items:
+
+            if op == sre_parse.LITERAL:
+                run[0] += chr (av)
+
+            # anchors have no width so that they do not break the current run
+            elif op == sre_parse.AT:
+                pass
+
+            # groups are transparent unless they modify flags
+            elif op == sre_parse.SUBPATTERN and not av[1] and not av[2]:
+                traverse (av[-1])
+
+            # the body of mandatory repetitions contains mandatory literals,
+            # but they are not contiguous with others
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+                close ()
+                traverse (av[2])
+                close ()
+
+            # anything else (optional items, alternatives, classes, ...) closes
+            # the current run
+            else:
+                close ()
+
+    traverse (tree)
+    close ()
+
+    return literals
+
+
+# -----------------------------------------------------------------------------
+# ZWCAhoCorasick
+#
+# Aho-Corasick automaton used for finding various literals at once
+# -----------------------------------------------------------------------------
+class ZWCAhoCorasick:
+    """Aho-Corasick automaton used for finding, with a single scan of a string,
+       all the literals of a given collection that occur in it. Every literal is
+       associated with a bitmask, and scanning a string returns the bitwise or
+       of the masks of all literals found in it
+
+    """
+
+    def __init__ (self, literals):
+        """creates an automaton for the given list of tuples (literal, mask)"""
+
+        # first, create a trie with all literals. Every state consists of a
+        # dictionary with its transitions, and the mask of the literals
+        # recognized in it
+        (self._delta, self._output) = ([dict ()], [0])
+        for literal, mask in literals:
+            state = 0
+            for char in literal:
+                if char not in self._delta[state]:
+                    self._delta.append (dict ())
+                    self._output.append (0)
+                    self._delta[state][char] = len (self._delta) - 1
+                state = self._delta[state][char]
+            self._output[state] |= mask
+
+        # second, compute the failure links in breadth-first order, so that
+        # states inherit the output of their failure states and the transitions
+        # of every state are completed with those of its failure state. As a
+        # result, the automaton becomes deterministic: chars with no transition
+        # lead to the initial state
+        failure = [0] * len (self._delta)
+        queue = list (self._delta[0].values ())
+        for state in queue:
+            for char, target in self._delta[state].items ():
+                queue.append (target)
+                failure[target] = self._delta[failure[state]].get (char, 0)
+                self._output[target] |= self._output[failure[target]]
+            for char, target in self._delta[failure[state]].items ():
+                self._delta[state].setdefault (char, target)
+
+
+    def scan (self, string):
+        """return the bitwise or of the masks of all literals found in the given
+           string
+
+        """
+
+        (delta, output) = (self._delta, self._output)
+        (state, mask) = (0, 0)
+        for char in string:
+            state = delta[state].get (char, 0)
+            mask |= output[state]
+
+        return mask
+
+
+# return a fingerprint of the given components
+def fingerprint (components):
+    """return a hashable fingerprint of the given list of components, instances
+       of ZWCSchemaComponent, which identifies the result of matching contents
+       against them: their kind, regular expression, flags and root, in order
+
+    """
+
+    return tuple ((type (icomponent.getRegexp ()).__name__,
+                   icomponent.getPattern ().pattern,
+                   icomponent.getPattern ().flags,
+                   icomponent.getRoot () and icomponent.getRoot ().pattern) for icomponent in components)
+
+
+# return the cache shared by all schemas with the given components
+def cache (components, size=CACHE_SIZE):
+    """return the cache of the given size shared by all schemas whose components
+       have the same fingerprint than the given ones. Thus, schemas created
+       with different components never share a cache. At most MAX_CACHES
+       caches are kept, so that schemas created afterwards with the
+       components of a discarded cache get a new one
+
+    """
+
+    key = (fingerprint (components), size)
+    with lock:
+        if key not in caches:
+            caches[key] = ZWCCache (size)
+            if len (caches) > MAX_CACHES:
+                caches.popitem (last=False)
+        caches.move_to_end (key)
+
+        return caches[key]
+
+
+# -----------------------------------------------------------------------------
+# ZWCCache
+#
+# Bounded cache with the result of matching contents
+# -----------------------------------------------------------------------------
+class ZWCCache:
+    """Bounded cache with the result of matching contents, i.e., the index of the
+       component matched and a dictionary with its named groups (or None if no
+       component matched). Once it is full, the least recently used content is
+       discarded. Caches can be shared by threads with no locks, as every
+       operation over the underlying dictionary is atomic, though the number
+       of hits and misses might then be slightly lower
+
+    """
+
+    def __init__ (self, size):
+        """creates an empty cache which stores at most size contents"""
+
+        (self._size, self._results) = (size, collections.OrderedDict ())
+        (self._hits, self._misses) = (0, 0)
+
+
+    def __str__ (self):
+        """return a human readable version of this cache"""
+
+        return "cache ({0} contents out of {1}, {2} hits and {3} misses)".format (len (self._results), self._size,
+                                                                                 self._hits, self._misses)
+
+
+    def get (self, content):
+        """return the result of matching the given content, or MISS if it is not
+           cached
+
+        """
+
+        result = self._results.get (content, MISS)
+        if result is MISS:
+            self._misses += 1
+        else:
+            self._hits += 1
+
+            # the content might have been discarded meanwhile by another thread
+            try:
+                self._results.move_to_end (content)
+            except KeyError:
+                pass
+
+        return result
+
+
+    def put (self, content, result):
+        """stores the result of matching the given content, discarding the least
+           recently used content if the cache is full
+
+        """
+
+        self._results[content] = result
+        if len (self._results) > self._size:
+
+            # another thread might have emptied the cache meanwhile
+            try:
+                self._results.popitem (last=False)
+            except KeyError:
+                pass
+
+
+    def getHits (self):
+        """return the number of contents found in this cache"""
+
+        return self._hits
+
+
+    def getMisses (self):
+        """return the number of contents not found in this cache"""
+
+        return self._misses
+
+
+    def getSize (self):
+        """return the maximum number of contents stored in this cache"""
+
+        return self._size
+
+
+# -----------------------------------------------------------------------------
+# ZWCSequentialMatcher
+#
+# Matches contents against every component, one after the other
+# -----------------------------------------------------------------------------
+class ZWCSequentialMatcher:
+    """Matches contents against every component, one after the other. This is the
+       reference engine: the first component that matches a content wins
+
+    """
+
+    def __init__ (self, components):
+        """creates a matcher for the given list of components, instances of
+           ZWCSchemaComponent. Their order is preserved
+
+        """
+
+        # store the components along with their compiled patterns
+        self._components = components
+        self._patterns = [(index, icomponent.getMatchFunction ()) for index, icomponent in enumerate (components)]
+
+
+    def __str__ (self):
+        """return a human readable version of this matcher"""
+
+        return "sequential ({0} regular expressions)".format (len (self._patterns))
+
+
+    def match (self, content):
+        """return a tuple (index, m) with the index of the first component matching
+           the given content and the match object, or None if no component
+           matches it
+
+        """
+
+        for index, imatch in self._patterns:
+            m = imatch (content)
+            if m:
+                return (index, m)
+
+        return None
+
+
+    def groups (self, index, m):
+        """return a dictionary with all named groups of the component with the given
+           index from the match object returned by match
+
+        """
+
+        return m.groupdict ()
+
+
+# -----------------------------------------------------------------------------
+# ZWCAlternationMatcher
+#
+# Matches contents against a single regular expression which combines the
+# regular expressions of all components
+# -----------------------------------------------------------------------------
+class ZWCAlternationMatcher:
+    """Matches contents against a single regular expression which combines the
+       regular expressions of all components as alternatives, each one tagged
+       with a group named after the index of its component. As alternatives are
+       tried from left to right, the first component that matches a content
+       wins, much like with the sequential matcher, but with only one call to
+       the regular expression engine per block of BLOCK_SIZE components.
+       Larger blocks are not used as the cost of combined regular expressions
+       grows quadratically with their number of alternatives.
+
+       Components whose regular expression can not be safely combined (e.g.,
+       because they use numbered backreferences or global flags, or they are
+       not matched with the re module) are matched separately, preserving their
+       order
+
+    """
+
+    def __init__ (self, components):
+        """creates a matcher for the given list of components, instances of
+           ZWCSchemaComponent. Their order is preserved
+
+        """
+
+        self._components = components
+
+        # the components are split into consecutive blocks, each one made of
+        # either a combined regular expression or a single component that can
+        # not be combined with others. Each block is a tuple (match, index)
+        # where index is None for combined blocks
+        self._blocks = []
+
+        # for every component, the named groups of its regular expression are
+        # stored as a list of tuples (name, renamed group)
+        self._groups = []
+
+        # the indexes of components matched separately are stored in a set
+        self._separate = set ()
+
+        branches = []
+        for index, icomponent in enumerate (components):
+
+            pattern = icomponent.getPattern ()
+            prefix = "{0}{1}_".format (TAG_PREFIX, index)
+            self._groups.append ([(name, prefix + name) for name in pattern.groupindex])
+
+            # if this component can be combined with others, add it to the
+            # current list of branches, closing the current block once it is
+            # full
+            if icomponent.getEngine () == "re" and self.isCombinable (pattern):
+                branches.append ("(?P<{0}{1}>{2})".format (TAG_PREFIX, index,
+                                                          renameGroups (pattern.pattern, prefix)))
+                if len (branches) == BLOCK_SIZE:
+                    self._blocks.append ((re.compile ("|".join (branches)).match, None))
+                    branches = []
+
+            # otherwise, close the current block and add another one
+            else:
+                if branches:
+                    self._blocks.append ((re.compile ("|".join (branches)).match, None))
+                    branches = []
+                self._blocks.append ((icomponent.getMatchFunction (), index))
+                self._separate.add (index)
+
+        # close the last block
+        if branches:
+            self._blocks.append ((re.compile ("|".join (branches)).match, None))
+
+        # tags are converted into indexes with a dictionary for efficiency
+        self._tags = {"{0}{1}".format (TAG_PREFIX, index): index for index in range (len (components))}
+
+
+    def __str__ (self):
+        """return a human readable version of this matcher"""
+
+        return "alternation ({0} blocks for {1} regular expressions)".format (len (self._blocks),
+                                                                           len (self._components))
+
+
+    @staticmethod
+    def isCombinable (pattern):
+        """return whether the given compiled pattern can be combined with others in a
+           single regular expression
+
+        """
+
+        # only strings with no flags other than the default ones can be
+        # combined, as global flags can not be given in the middle of a regular
+        # expression
+        if not isinstance (pattern.pattern, str) or pattern.flags != DEFAULT_FLAGS:
+            return False
+
+        # numbered backreferences can not be used either as renumbering groups
+        # would break them. Note that they could be just bogus escapes in
+        # character classes, but these are just ignored for the sake of
+        # simplicity
+        if re.search (r'\\[1-9]|\(\?\(', pattern.pattern):
+            return False
+
+        # finally, verify that the renamed pattern compiles
+        try:
+            re.compile (renameGroups (pattern.pattern, TAG_PREFIX))
+        except re.error:
+            return False
+
+        return True
+
+
+    def match (self, content):
+        """return a tuple (index, m) with the index of the first component matching
+           the given content and the match object, or None if no component
+           matches it
+
+        """
+
+        for imatch, index in self._blocks:
+            m = imatch (content)
+            if m:
+                return (self._tags[m.lastgroup], m) if index is None else (index, m)
+
+        return None
+
+
+    def groups (self, index, m):
+        """return a dictionary with all named groups of the component with the given
+           index from the match object returned by match
+
+        """
+
+        # if this component was matched separately, then return its named
+        # groups
+        if index in self._separate:
+            return m.groupdict ()
+
+        # otherwise, translate the renamed groups
+        return {name: m.group (renamed) for name, renamed in self._groups[index]}
+
+
+# -----------------------------------------------------------------------------
+# ZWCPrefilterMatcher
+#
+# Matches contents only against those components whose required literals occur
+# in them
+# -----------------------------------------------------------------------------
+class ZWCPrefilterMatcher:
+    """Matches contents only against those components whose required literals occur
+       in them. When creating the matcher, the longest literal that appears in
+       every string matched by each component is extracted, and all of them are
+       compiled into an Aho-Corasick automaton. Every content is then scanned
+       only once to find the components that could match it, and only their
+       regular expressions are applied, in order, so that the first component
+       that matches a content wins. Components with no required literal are
+       always candidates.
+
+       As a result, the cost of evaluating contents grows with the number of
+       candidate components rather than with the number of components. With
+       less than PREFILTER_SIZE components, the automaton costs more than the
+       matches it saves, and contents are matched as with the sequential
+       engine instead
+
+    """
+
+    def __init__ (self, components):
+        """creates a matcher for the given list of components, instances of
+           ZWCSchemaComponent. Their order is preserved
+
+        """
+
+        self._components = components
+        self._patterns = [icomponent.getMatchFunction () for icomponent in components]
+
+        # compute the required literal of each component. The mask of every
+        # component is a bit in the position given by its index
+        (literals, self._always) = ([], 0)
+        for index, icomponent in enumerate (components):
+
+            required = requiredLiterals (icomponent.getPattern ())
+            if required:
+                literals.append ((max (required, key=len), 1 << index))
+            else:
+                self._always |= 1 << index
+
+        self._literals = literals
+        self._automaton = ZWCAhoCorasick (literals)
+
+        # small schemas are matched sequentially, with no overhead per content
+        if len (components) < PREFILTER_SIZE:
+            self.match = ZWCSequentialMatcher (components).match
+
+
+    def __str__ (self):
+        """return a human readable version of this matcher"""
+
+        if len (self._components) < PREFILTER_SIZE:
+            return "prefilter (sequential for {0} regular expressions)".format (len (self._components))
+
+        return "prefilter ({0} literals for {1} regular expressions)".format (len (self._literals),
+                                                                           len (self._components))
+
+
+    def match (self, content):
+        """return a tuple (index, m) with the index of the first component matching
+           the given content and the match object, or None if no component
+           matches it
+
+        """
+
+        # get the candidates and try them in ascending order of their index
+        candidates = self._automaton.scan (content) | self._always
+        while candidates:
+            lowest = candidates & -candidates
+            index = lowest.bit_length () - 1
+            m = self._patterns[index] (content)
+            if m:
+                return (index, m)
+            candidates ^= lowest
+
+        return None
+
+
+    def groups (self, index, m):
+        """return a dictionary with all named groups of the component with the given
+           index from the match object returned by match
+
+        """
+
+        return m.groupdict ()
+
+
+# -----------------------------------------------------------------------------
+# ZWCRootMatcher
+#
+# Matches contents against components relative to a root directory and against
+# absolute components
+# -----------------------------------------------------------------------------
+class ZWCRootMatcher:
+    """Matches contents against components relative to a root directory and
+       against absolute components. The root is matched only once against every
+       distinct top-level directory, and relative components are matched only
+       against the rest of the contents. The first component that matches a
+       content wins, whether it is relative or absolute
+
+    """
+
+    def __init__ (self, components, create, root):
+        """creates a matcher for the given list of components, instances of
+           ZWCSchemaComponent, whose order is preserved. Relative and absolute
+           components are matched with different matchers, created with the
+           given function from a list of components. The root is given as a
+           compiled regular expression
+
+        """
+
+        (self._components, self._root) = (components, root)
+
+        # store the positions in the schema of relative and absolute components
+        # and create a matcher for each kind, if there is any
+        (self._positions, self._matchers) = ([[], []], [None, None])
+        for index, icomponent in enumerate (components):
+            self._positions[icomponent.getRoot () is None].append (index)
+        for kind in range (2):
+            if self._positions[kind]:
+                self._matchers[kind] = create ([components[index] for index in self._positions[kind]])
+
+        # the named groups of all top-level directories matching the root (or
+        # None if they do not match it) are cached, up to ROOTS_SIZE
+        # directories
+        self._roots = dict ()
+
+
+    def __str__ (self):
+        """return a human readable version of this matcher"""
+
+        return "{0} for {1} relative components and {2} for {3} absolute components".format (self._matchers[0], len (self._positions[0]),
+                                                                                           self._matchers[1], len (self._positions[1]))
+
+
+    def match (self, content):
+        """return a tuple (index, m) with the index of the first component matching
+           the given content and the match object, or None if no component
+           matches it
+
+        """
+
+        result = None
+
+        # match relative components against the rest of the contents if their
+        # top-level directory matches the root
+        slash = content.find ('/')
+        if self._matchers[0] and slash != -1:
+
+            top = content[:slash+1]
+            groups = self._roots.get (top, MISS)
+            if groups is MISS:
+                if len (self._roots) >= ROOTS_SIZE:
+                    self._roots.clear ()
+                m = self._root.fullmatch (top)
+                groups = self._roots[top] = m.groupdict () if m else None
+
+            if groups is not None:
+                relative = self._matchers[0].match (content[slash+1:])
+                if relative:
+                    result = (self._positions[0][relative[0]], (0, relative, groups))
+
+        # absolute components are matched only if any precedes the relative one
+        if self._matchers[1] and (result is None or self._positions[1][0] < result[0]):
+            absolute = self._matchers[1].match (content)
+            if absolute and (result is None or self._positions[1][absolute[0]] < result[0]):
+                result = (self._positions[1][absolute[0]], (1, absolute, dict ()))
+
+        return result
+
+
+    def groups (self, index, m):
+        """return a dictionary with all named groups of the component with the given
+           index from the match object returned by match, including those of
+           the root
+
+        """
+
+        (kind, (position, match), groups) = m
+        groups = dict (groups)
+        groups.update (self._matchers[kind].groups (position, match))
+
+        return groups
+
+
+# caches
+# -----------------------------------------------------------------------------
+
+# caches shared by all schemas, indexed by the fingerprint of their components
+# and their size in the order they were last requested, and the lock used for
+# creating them
+caches = collections.OrderedDict ()
+lock = threading.Lock ()
+
+# engines
+# -----------------------------------------------------------------------------
+
+# all matching engines indexed by their name
+engines = {
+    "sequential": ZWCSequentialMatcher,
+    "alternation": ZWCAlternationMatcher,
+    "prefilter": ZWCPrefilterMatcher
+}
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
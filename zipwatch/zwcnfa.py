@@ -0,0 +1,645 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcnfa.py
+# Description: linear-time matching of regular expressions with the simulation
+#              of nondeterministic finite automata
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+linear-time matching of regular expressions with the simulation of
+nondeterministic finite automata
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import re                       # matching regular expressions
+import threading                # thread-local data
+
+# the parser of regular expressions is used for compiling them. Since Python
+# 3.11 it is a private module of the re package
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# constants
+# -----------------------------------------------------------------------------
+
+# instructions of the programs simulated by the automata
+(CONSUME, SPLIT, JUMP, SAVE, ASSERT, LOOP, MATCH) = range (7)
+
+# maximum number of instructions of a program. Regular expressions with larger
+# programs (usually because of large bounded repetitions) are not supported
+MAX_INSTRUCTIONS = 20000
+
+# maximum number of transitions of the deterministic automata cached. Once this
+# number is exceeded, the cache is emptied
+MAX_TRANSITIONS = 10000
+
+# flags supported by the automata. Others (e.g., re.IGNORECASE or re.MULTILINE)
+# are not supported
+SUPPORTED_FLAGS = re.UNICODE | re.DOTALL
+
+# predicates of the categories of characters supported
+CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: str.isdecimal,
+    sre_parse.CATEGORY_NOT_DIGIT: lambda char: not char.isdecimal (),
+    sre_parse.CATEGORY_SPACE: str.isspace,
+    sre_parse.CATEGORY_NOT_SPACE: lambda char: not char.isspace (),
+    sre_parse.CATEGORY_WORD: lambda char: char.isalnum () or char == '_',
+    sre_parse.CATEGORY_NOT_WORD: lambda char: not (char.isalnum () or char == '_')
+}
+
+
+# -----------------------------------------------------------------------------
+# ZWCNFAError
+#
+# Exception raised when a regular expression is not supported by the automata
+# -----------------------------------------------------------------------------
+class ZWCNFAError (Exception):
+    """Exception raised when a regular expression is not supported by the
+       automata
+
+    """
+
+    pass
+
+
+# functions
+# -----------------------------------------------------------------------------
+
+# return whether the char at the given position is a word char
+def isWord (string, position):
+    """return whether the char at the given position of the string is a word
+       char. Positions out of bounds are not
+
+    """
+
+    return 0 <= position < len (string) and (string[position].isalnum () or string[position] == '_')
+
+
+# return whether the given items of a regular expression can match the empty
+# string
+def isNullable (items):
+    """return whether the given sequence of items of a regular expression, as
+       returned by its parser, can match the empty string
+
+    """
+
+    for op, av in items:
+
+        if op == sre_parse.AT:
+            continue
+        if op == sre_parse.SUBPATTERN and isNullable (av[-1]):
+            continue
+        if op == sre_parse.BRANCH and any (isNullable (ialternative) for ialternative in av[1]):
+            continue
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and (not av[0] or isNullable (av[2])):
+            continue
+
+        return False
+
+    return True
+
+
+# return a predicate deciding whether a char is matched by the given item
+def predicate (op, av, dotall=False):
+    """return a function which decides whether a char is matched by the given
+       item of a regular expression, as returned by its parser. If dotall is
+       true, any char matches the item ANY; otherwise, all but newlines do
+
+    """
+
+    if op == sre_parse.LITERAL:
+        return chr (av).__eq__
+
+    if op == sre_parse.NOT_LITERAL:
+        return chr (av).__ne__
+
+    if op == sre_parse.ANY:
+        return (lambda char: True) if dotall else "\n".__ne__
+
+    if op == sre_parse.IN:
+
+        # compute the predicates of all items of this class
+        (negate, predicates) = (False, [])
+        for iop, iav in av:
+            if iop == sre_parse.NEGATE:
+                negate = True
+            elif iop == sre_parse.LITERAL:
+                predicates.append (chr (iav).__eq__)
+            elif iop == sre_parse.RANGE:
+                predicates.append (lambda char, low=iav[0], high=iav[1]: low <= ord (char) <= high)
+            elif iop == sre_parse.CATEGORY and iav in CATEGORIES:
+                predicates.append (CATEGORIES[iav])
+            else:
+                raise ZWCNFAError ("unsupported item '{0}' in a class".format (iop))
+
+        if negate:
+            return lambda char: not any (ipredicate (char) for ipredicate in predicates)
+        return lambda char: any (ipredicate (char) for ipredicate in predicates)
+
+    raise ZWCNFAError ("unsupported item '{0}'".format (op))
+
+
+# -----------------------------------------------------------------------------
+# ZWCNFAMatch
+#
+# Result of matching a string with an automaton
+# -----------------------------------------------------------------------------
+class ZWCNFAMatch:
+    """Result of matching a string with an automaton. It provides the same
+       services than the match objects of the re module to access groups. The
+       positions of groups are computed only when they are accessed for the
+       first time
+
+    """
+
+    def __init__ (self, nfa, string):
+        """creates a match of the given automaton with the given string"""
+
+        (self.re, self.string, self._captures) = (nfa, string, None)
+
+
+    def __bool__ (self):
+        """matches are always true"""
+
+        return True
+
+
+    def __repr__ (self):
+        """return a representation of this match"""
+
+        return "<zwcnfa.ZWCNFAMatch object; span={0}, match={1!r}>".format (self.span (), self.group ())
+
+
+    def index (self, group):
+        """return the index of the given group, either a number or a name"""
+
+        if isinstance (group, str):
+            if group not in self.re.groupindex:
+                raise IndexError ("no such group")
+            return self.re.groupindex[group]
+
+        if not 0 <= group <= self.re.groups:
+            raise IndexError ("no such group")
+        return group
+
+
+    def span (self, group=0):
+        """return a tuple with the start and end positions of the given group, or
+           (-1, -1) if it did not participate in the match
+
+        """
+
+        if self._captures is None:
+            self._captures = self.re.capture (self.string)
+
+        index = self.index (group)
+        (start, end) = (self._captures[2*index], self._captures[2*index+1])
+        return (-1, -1) if start is None or end is None else (start, end)
+
+
+    def start (self, group=0):
+        """return the start position of the given group"""
+
+        return self.span (group)[0]
+
+
+    def end (self, group=0):
+        """return the end position of the given group"""
+
+        return self.span (group)[1]
+
+
+    def group (self, *groups):
+        """return the substring matched by the given groups, a single string if only
+           one is given and a tuple otherwise
+
+        """
+
+        def substring (group):
+            (start, end) = self.span (group)
+            return None if start < 0 else self.string[start:end]
+
+        if len (groups) <= 1:
+            return substring (groups[0] if groups else 0)
+        return tuple (substring (group) for group in groups)
+
+
+    def groups (self, default=None):
+        """return a tuple with the substrings matched by all groups"""
+
+        return tuple (default if self.start (index) < 0 else self.group (index)
+                      for index in range (1, self.re.groups + 1))
+
+
+    def groupdict (self, default=None):
+        """return a dictionary with the substrings matched by all named groups"""
+
+        return {name: default if self.start (name) < 0 else self.group (name)
+                for name in self.re.groupindex}
+
+
+# -----------------------------------------------------------------------------
+# ZWCNFA
+#
+# Nondeterministic finite automaton which recognizes a regular expression
+# -----------------------------------------------------------------------------
+class ZWCNFA:
+    """Nondeterministic finite automaton which recognizes a regular expression. The
+       automaton is compiled into a program which is simulated with all its
+       threads in lockstep (i.e., a Pike VM), so that the time taken for
+       matching a string is linear in its length, whatever the regular
+       expression. Threads are kept in order of priority so that the groups
+       captured are the same than those captured by the re module.
+
+       To avoid simulating all threads for every string, whether a string is
+       matched or not is decided with a deterministic automaton whose states
+       are the sets of instructions of the threads, which is built lazily while
+       matching strings. Groups are computed only for those strings that are
+       matched.
+
+       Only a subset of regular expressions is supported: literals, classes,
+       categories of chars, groups, alternatives, greedy and lazy repetitions
+       and the anchors ^, $, \\A, \\Z, \\b and \\B. Regular expressions with
+       backreferences, lookarounds, conditionals, possessive repetitions or
+       flags other than re.DOTALL raise ZWCNFAError when compiled
+
+    """
+
+    def __init__ (self, pattern):
+        """compiles the given pattern, either a string or a compiled regular
+           expression, into an automaton. If it is not supported, ZWCNFAError
+           is raised
+
+        """
+
+        # compile the pattern with the re module to get its groups and flags
+        compiled = re.compile (pattern)
+        if not isinstance (compiled.pattern, str):
+            raise ZWCNFAError ("only regular expressions given as strings are supported")
+        if compiled.flags & ~SUPPORTED_FLAGS:
+            raise ZWCNFAError ("the flags of the regular expression are not supported")
+
+        (self.pattern, self.flags, self.groups, self.groupindex) = \
+            (compiled.pattern, compiled.flags, compiled.groups, compiled.groupindex)
+        self._dotall = bool (compiled.flags & re.DOTALL)
+
+        # and now compile the program of the automaton. Besides the positions
+        # of groups, threads record the position where the current iteration
+        # of every loop started in additional slots
+        (self._program, self._slots) = ([], 2 * (self.groups + 1))
+        tree = sre_parse.parse (compiled.pattern, compiled.flags)
+        self.compile (tree)
+        self.emit (MATCH)
+
+        # the transitions of the deterministic automaton are indexed by the
+        # current state, the next char and, if the program contains anchors,
+        # the context of the next position. States are tuples (instructions,
+        # accepting) indexed by their identifiers. Every thread expands its own
+        # deterministic automaton (see accepts), so that automata can be shared
+        # by threads
+        self._anchors = any (instruction[0] == ASSERT for instruction in self._program)
+        self._boundaries = any (instruction[0] == ASSERT and
+                                instruction[1] in (sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY)
+                                for instruction in self._program)
+        self._tables = threading.local ()
+
+        # the literal prefix of the regular expression, if any, is used to
+        # quickly discard strings that do not start with it
+        self._prefix = ""
+        for op, av in tree:
+            if op != sre_parse.LITERAL:
+                break
+            self._prefix += chr (av)
+
+
+    def __len__ (self):
+        """return the number of instructions of the program of this automaton"""
+
+        return len (self._program)
+
+
+    def emit (self, *instruction):
+        """add the given instruction to the program and return its position"""
+
+        if len (self._program) >= MAX_INSTRUCTIONS:
+            raise ZWCNFAError ("the regular expression is too large")
+
+        self._program.append (list (instruction))
+        return len (self._program) - 1
+
+
+    def compile (self, items):
+        """add to the program the instructions that recognize the given sequence of
+           items of a regular expression, as returned by its parser
+
+        """
+
+        for op, av in items:
+
+            if op in (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN):
+                self.emit (CONSUME, predicate (op, av, self._dotall))
+
+            elif op == sre_parse.AT:
+                if av not in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING,
+                              sre_parse.AT_END, sre_parse.AT_END_STRING,
+                              sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY):
+                    raise ZWCNFAError ("unsupported anchor '{0}'".format (av))
+                self.emit (ASSERT, av)
+
+            elif op == sre_parse.SUBPATTERN:
+
+                # groups can not modify flags
+                (group, addflags, delflags, subitems) = (av[0], av[1], av[2], av[-1])
+                if addflags or delflags:
+                    raise ZWCNFAError ("groups modifying flags are not supported")
+
+                if group is not None:
+                    self.emit (SAVE, 2 * group)
+                self.compile (subitems)
+                if group is not None:
+                    self.emit (SAVE, 2 * group + 1)
+
+            elif op == sre_parse.BRANCH:
+
+                # every alternative but the last one is preceded by a split
+                # between it and the next alternative, and followed by a jump to
+                # the end of all alternatives
+                jumps = []
+                for ialternative in av[1][:-1]:
+                    split = self.emit (SPLIT, None, None)
+                    self._program[split][1] = len (self._program)
+                    self.compile (ialternative)
+                    jumps.append (self.emit (JUMP, None))
+                    self._program[split][2] = len (self._program)
+                self.compile (av[1][-1])
+                for ijump in jumps:
+                    self._program[ijump][1] = len (self._program)
+
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                self.repeat (av[0], av[1], av[2], op == sre_parse.MAX_REPEAT)
+
+            else:
+                raise ZWCNFAError ("unsupported item '{0}'".format (op))
+
+
+    def repeat (self, minimum, maximum, items, greedy):
+        """add to the program the instructions that recognize the given items
+           repeated between minimum and maximum times, either greedy or lazy
+
+        """
+
+        # the re module follows its own rules to decide when to stop repeating
+        # items that match the empty string, so that they are not supported
+        if maximum - minimum > 1 and isNullable (items):
+            raise ZWCNFAError ("repetitions of items matching the empty string are not supported")
+
+        # first, the mandatory repetitions
+        for _ in range (minimum):
+            self.compile (items)
+
+        # if there is no upper bound, then add a loop. Much like the re module
+        # does, iterations matching the empty string exit the loop
+        if maximum == sre_parse.MAXREPEAT:
+            (slot, self._slots) = (self._slots, self._slots + 1)
+            split = self.emit (SPLIT, None, None)
+            self.emit (SAVE, slot)
+            self.compile (items)
+            self.emit (LOOP, slot, split)
+            self.split (split, split + 1, len (self._program), greedy)
+
+        # otherwise, add as many optional repetitions as needed, nested so that
+        # every one is tried only if the previous one matched
+        else:
+            splits = []
+            for _ in range (maximum - minimum):
+                splits.append (self.emit (SPLIT, None, None))
+                self.compile (items)
+            for isplit in splits:
+                self.split (isplit, isplit + 1, len (self._program), greedy)
+
+
+    def split (self, position, first, second, greedy):
+        """set the targets of the split in the given position so that the first one
+           is preferred if greedy, and the second one otherwise
+
+        """
+
+        self._program[position][1:] = [first, second] if greedy else [second, first]
+
+
+    def holds (self, anchor, string, position):
+        """return whether the given anchor holds in the given position of the
+           string
+
+        """
+
+        if anchor in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING):
+            return position == 0
+        if anchor == sre_parse.AT_END:
+            return position == len (string) or (position == len (string) - 1 and string[position] == '\n')
+        if anchor == sre_parse.AT_END_STRING:
+            return position == len (string)
+
+        boundary = isWord (string, position - 1) != isWord (string, position)
+        return boundary if anchor == sre_parse.AT_BOUNDARY else not boundary
+
+
+    def addThread (self, threads, visited, pc, captures, string, position):
+        """add to the given list of threads the one starting at the given program
+           counter with the given captures, following all instructions that do
+           not consume chars in order of priority. Program counters already
+           visited in this position are ignored
+
+        """
+
+        program = self._program
+        stack = [(pc, captures)]
+        while stack:
+
+            (pc, captures) = stack.pop ()
+            if pc in visited:
+                continue
+            visited.add (pc)
+
+            instruction = program[pc]
+            if instruction[0] == JUMP:
+                stack.append ((instruction[1], captures))
+            elif instruction[0] == SPLIT:
+                stack.append ((instruction[2], captures))
+                stack.append ((instruction[1], captures))
+            elif instruction[0] == SAVE:
+                slot = instruction[1]
+                stack.append ((pc + 1, captures[:slot] + (position,) + captures[slot+1:]))
+            elif instruction[0] == ASSERT:
+                if self.holds (instruction[1], string, position):
+                    stack.append ((pc + 1, captures))
+            elif instruction[0] == LOOP:
+                stack.append ((pc + 1 if captures[instruction[1]] == position else instruction[2], captures))
+            else:
+                threads.append ((pc, captures))
+
+
+    def context (self, string, position):
+        """return the context of the given position of the string, i.e., all the
+           information required to decide whether the anchors of this automaton
+           hold in it
+
+        """
+
+        if not self._anchors:
+            return None
+
+        return (position == 0, position == len (string),
+                position == len (string) - 1 and string[position] == '\n',
+                isWord (string, position - 1), isWord (string, position))
+
+
+    def closure (self, pcs, string, position):
+        """return the identifier of the state of the deterministic automaton with all
+           the instructions consuming chars which are reachable from the given
+           program counters in the given position of the string without
+           consuming chars
+
+        """
+
+        program = self._program
+        (stack, visited, consuming, accepting) = (list (reversed (pcs)), set (), [], False)
+        while stack:
+
+            pc = stack.pop ()
+            if pc in visited:
+                continue
+            visited.add (pc)
+
+            instruction = program[pc]
+            if instruction[0] == JUMP:
+                stack.append (instruction[1])
+            elif instruction[0] == SPLIT:
+                stack.extend ((instruction[2], instruction[1]))
+            elif instruction[0] == SAVE:
+                stack.append (pc + 1)
+            elif instruction[0] == ASSERT:
+                if self.holds (instruction[1], string, position):
+                    stack.append (pc + 1)
+
+            # as loops of items matching the empty string are not supported,
+            # iterations can not be empty and thus loops always jump back
+            elif instruction[0] == LOOP:
+                stack.append (instruction[2])
+            elif instruction[0] == MATCH:
+                accepting = True
+            else:
+                consuming.append (pc)
+
+        # return the identifier of this state, creating it if necessary
+        (transitions, states, identifiers) = self._tables.dfa
+        state = (tuple (consuming), accepting)
+        if state not in identifiers:
+            identifiers[state] = len (states)
+            states.append (state)
+        return identifiers[state]
+
+
+    def accepts (self, string):
+        """return whether a prefix of the given string is recognized by this
+           automaton. This is decided with the deterministic automaton, which
+           is expanded as needed
+
+        """
+
+        # get the cache of the current thread, and empty it if it grew too much
+        tables = getattr (self._tables, 'dfa', None)
+        if tables is None or len (tables[0]) > MAX_TRANSITIONS:
+            tables = self._tables.dfa = (dict (), [], dict ())
+
+        (program, (transitions, states, identifiers)) = (self._program, tables)
+
+        # the initial state is cached as a transition from no state
+        context = self.context (string, 0)
+        state = transitions.get ((None, None, context))
+        if state is None:
+            state = transitions[(None, None, context)] = self.closure ((0,), string, 0)
+
+        # unless the program contains word boundaries, the context of all
+        # positions but the first and the last ones are the same
+        (anchors, boundaries, last) = (self._anchors, self._boundaries, len (string) - 2)
+        for position, char in enumerate (string):
+
+            (consuming, accepting) = states[state]
+            if accepting:
+                return True
+            if not consuming:
+                return False
+
+            context = self.context (string, position + 1) if boundaries or (anchors and position >= last) else None
+            following = transitions.get ((state, char, context))
+            if following is None:
+                following = self.closure ([pc + 1 for pc in consuming if program[pc][1] (char)],
+                                          string, position + 1)
+                transitions[(state, char, context)] = following
+            state = following
+
+        return states[state][1]
+
+
+    def capture (self, string):
+        """return a tuple with the start and end positions of all groups of the match
+           of this automaton with the given string, which has to be matched
+
+        """
+
+        program = self._program
+        captures = (0, None) + (None,) * (self._slots - 2)
+
+        # simulate all threads in lockstep
+        (threads, result) = ([], None)
+        self.addThread (threads, set (), 0, captures, string, 0)
+        for position in range (len (string) + 1):
+
+            if not threads:
+                break
+
+            (following, visited) = ([], set ())
+            char = string[position] if position < len (string) else None
+            for pc, captures in threads:
+
+                instruction = program[pc]
+
+                # threads reaching the end of the program match the string. Threads
+                # with less priority are then discarded
+                if instruction[0] == MATCH:
+                    result = captures[:1] + (position,) + captures[2:]
+                    break
+
+                # otherwise, proceed only if the next char is consumed
+                if char is not None and instruction[1] (char):
+                    self.addThread (following, visited, pc + 1, captures, string, position + 1)
+
+            threads = following
+
+        return result
+
+
+    def match (self, string):
+        """return an instance of ZWCNFAMatch if a prefix of the given string is
+           recognized by this automaton, and None otherwise
+
+        """
+
+        if not string.startswith (self._prefix) or not self.accepts (string):
+            return None
+
+        return ZWCNFAMatch (self, string)
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcoptimizer.py
+# Description: static optimization of the order in which the components of
+#              schemas are matched
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+static optimization of the order in which the components of schemas are matched
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import heapq                    # priority queues
+import re                       # matching regular expressions
+
+import zwcnfa
+
+# the parser of regular expressions is used for analyzing them. Since Python
+# 3.11 it is a private module of the re package
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# constants
+# -----------------------------------------------------------------------------
+
+# items of regular expressions which consume a single char
+CHARS = (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN)
+
+# repetitions
+REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+# anchors which always hold at the beginning of contents
+BEGINNINGS = (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING)
+
+# maximum number of chars of repetitions with a fixed number of iterations
+# which are unrolled when analyzing regular expressions
+MAX_UNROLL = 64
+
+# maximum number of components of schemas which are optimized, as all pairs of
+# components are analyzed
+MAX_COMPONENTS = 1000
+
+# functions
+# -----------------------------------------------------------------------------
+
+# return whether the given items of a regular expression contain anchors
+def hasAnchors (items):
+    """return whether the given sequence of items of a regular expression, as
+       returned by its parser, contains any anchor
+
+    """
+
+    for op, av in items:
+
+        if op == sre_parse.AT:
+            return True
+        if op == sre_parse.SUBPATTERN and hasAnchors (av[-1]):
+            return True
+        if op == sre_parse.BRANCH and any (hasAnchors (ialternative) for ialternative in av[1]):
+            return True
+        if op in REPEATS and hasAnchors (av[2]):
+            return True
+
+    return False
+
+
+# return the items of a regular expression with its groups expanded
+def flatten (items, dotall):
+    """return a list of tuples (op, av, dotall) with the given sequence of items of
+       a regular expression, as returned by its parser, where groups which do
+       not make it case-insensitive are replaced by their contents, and
+       repetitions of a single char with a fixed number of iterations are
+       unrolled. dotall tells whether the flag re.DOTALL applies to every item
+
+    """
+
+    result = list ()
+    for op, av in items:
+
+        if op == sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+            result += flatten (av[-1], bool ((dotall or av[1] & re.DOTALL) and not av[2] & re.DOTALL))
+        elif op in REPEATS and av[0] == av[1] <= MAX_UNROLL and \
+             len (av[2]) == 1 and av[2][0][0] in CHARS:
+            result += [(av[2][0][0], av[2][0][1], dotall)] * av[0]
+        else:
+            result.append ((op, av, dotall))
+
+    return result
+
+
+# return a description of the contents matched by a compiled pattern
+def describe (pattern):
+    """return a tuple (chars, exact, universal) which describes the contents
+       matched by the given compiled pattern, or None if it can not be
+       analyzed. chars is a list with the items that have to match the first
+       chars of contents, given as tuples (char, predicate), where char is the
+       char matched by literal items and None otherwise. exact is true if the
+       pattern matches only the string made of all chars, and universal is
+       true if it matches any content whose first chars match them
+
+    """
+
+    # case-insensitive patterns do not match literals verbatim
+    if not isinstance (pattern.pattern, str) or pattern.flags & re.IGNORECASE:
+        return None
+
+    try:
+        tree = sre_parse.parse (pattern.pattern, pattern.flags)
+    except (re.error, RecursionError):
+        return None
+
+    # anchors at the beginning of the pattern always hold, as patterns are
+    # matched at the beginning of contents
+    items = flatten (tree, bool (pattern.flags & re.DOTALL))
+    while items and items[0][0] == sre_parse.AT and items[0][1] in BEGINNINGS:
+        items.pop (0)
+
+    # collect the items matching the first chars
+    chars = list ()
+    while items and items[0][0] in CHARS:
+        (op, av, dotall) = items[0]
+        try:
+            chars.append ((chr (av) if op == sre_parse.LITERAL else None,
+                           zwcnfa.predicate (op, av, dotall)))
+        except zwcnfa.ZWCNFAError:
+            break
+        items.pop (0)
+
+    # and analyze the rest of the pattern
+    rest = [(op, av) for op, av, dotall in items]
+    exact = all (ichar is not None for ichar, ipredicate in chars) and \
+        rest == [(sre_parse.AT, sre_parse.AT_END_STRING)]
+    universal = zwcnfa.isNullable (rest) and not hasAnchors (rest)
+
+    return (chars, exact, universal)
+
+
+# return whether two descriptions can not match the same content
+def disjoint (description1, description2):
+    """return whether it is proven that no content is matched by both patterns with
+       the given descriptions, as returned by describe. Unknown descriptions
+       (None) are never disjoint
+
+    """
+
+    if description1 is None or description2 is None:
+        return False
+
+    (chars1, exact1, universal1) = description1
+    (chars2, exact2, universal2) = description2
+
+    # the first chars of contents can not be matched by both patterns if a
+    # literal of one of them is not matched by the other
+    for (char1, predicate1), (char2, predicate2) in zip (chars1, chars2):
+        if (char1 is not None and not predicate2 (char1)) or \
+           (char2 is not None and not predicate1 (char2)):
+            return True
+
+    # patterns matching only one string can not match longer contents
+    return (exact1 and len (chars2) > len (chars1)) or (exact2 and len (chars1) > len (chars2))
+
+
+# return whether a description matches all contents matched by another one
+def shadows (description1, description2):
+    """return whether it is proven that all contents matched by the second
+       description are matched by the first one, as returned by describe
+
+    """
+
+    if description1 is None or description2 is None:
+        return False
+
+    (chars1, exact1, universal1) = description1
+    (chars2, exact2, universal2) = description2
+
+    # patterns matching any content starting with some chars shadow those
+    # whose first chars are literals matching them
+    if universal1 and len (chars2) >= len (chars1):
+        return all (char2 is not None and predicate1 (char2)
+                    for (char1, predicate1), (char2, predicate2) in zip (chars1, chars2))
+
+    # and patterns matching the same string shadow each other
+    return exact1 and exact2 and [ichar for ichar, ipredicate in chars1] == [ichar for ichar, ipredicate in chars2]
+
+
+# return the cost of matching a description
+def cost (description):
+    """return an estimation of the cost of rejecting contents with a pattern with
+       the given description, as returned by describe: 0 for exact strings, 1
+       for patterns starting with a literal, 2 for patterns starting with any
+       other char, and 3 otherwise
+
+    """
+
+    if description is None or not description[0]:
+        return 3
+    if description[1]:
+        return 0
+    if description[0][0][0] is not None:
+        return 1
+
+    return 2
+
+
+# return the plan for matching the given components
+def plan (components, frequencies=None):
+    """return a tuple (order, unreachable) with the plan for matching the given
+       list of components, instances of ZWCSchemaComponent, in first-match-wins
+       order. order is the list of positions of components in the order they
+       should be matched and unreachable is a dictionary with the position of
+       every component which can never match any content as key and the
+       position of a preceding component matching all its contents as value.
+
+       Unreachable components are not included in the order, though
+       components with a parent never make others unreachable, as they are
+       disabled if their parent is missing (see ZWCSchema.resolveParents).
+       The reachable components are reordered so that the cheapest ones are
+       matched first, but only if they are proven not to match the same
+       contents than those they are moved ahead of, so that the first
+       component matching every content is always the same. If a list with
+       the frequency of hits of every component is given, those with more
+       hits are matched first instead, and the cost is used only for breaking
+       ties. Schemas with more than MAX_COMPONENTS components are not
+       optimized
+
+    """
+
+    if len (components) > MAX_COMPONENTS:
+        return (list (range (len (components))), dict ())
+
+    # components with different roots are matched against different strings so
+    # that they are never related. The same happens with components which are
+    # not given as regular expressions
+    descriptions = [describe (icomponent.getPattern ()) for icomponent in components]
+    def related (i, j):
+        return components[i].getRoot () is components[j].getRoot ()
+
+    # find all unreachable components. Components with the same regular
+    # expression are unreachable as well, unless the preceding one might be
+    # disabled
+    unreachable = dict ()
+    for j, jcomponent in enumerate (components):
+        for i in range (j):
+            if i not in unreachable and components[i].getParent () is None and related (i, j) and \
+               ((components[i].getPattern ().pattern, components[i].getPattern ().flags) ==
+                (jcomponent.getPattern ().pattern, jcomponent.getPattern ().flags) or
+                shadows (descriptions[i], descriptions[j])):
+                unreachable[j] = i
+                break
+
+    # every component has to be matched after all preceding components that
+    # might match the same contents
+    reachable = [index for index in range (len (components)) if index not in unreachable]
+    (predecessors, successors) = ({index: 0 for index in reachable}, {index: [] for index in reachable})
+    for position, j in enumerate (reachable):
+        for i in reachable[:position]:
+            if not related (i, j) or not disjoint (descriptions[i], descriptions[j]):
+                predecessors[j] += 1
+                successors[i].append (j)
+
+    # and among those which can be matched next, the one with more hits or the
+    # cheapest one is chosen, breaking ties in favour of the first one in the
+    # schema
+    def priority (index):
+        return (-frequencies[index] if frequencies else 0, cost (descriptions[index]), index)
+
+    order = list ()
+    queue = [priority (index) for index in reachable if not predecessors[index]]
+    heapq.heapify (queue)
+    while queue:
+        index = heapq.heappop (queue)[-1]
+        order.append (index)
+        for isuccessor in successors[index]:
+            predecessors[isuccessor] -= 1
+            if not predecessors[isuccessor]:
+                heapq.heappush (queue, priority (isuccessor))
+
+    return (order, unreachable)
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End:
@@ -14,11 +14,123 @@ defines the schema the contents of a zip file are compared with
 
 # imports
 # -----------------------------------------------------------------------------
+import collections.abc          # abstract base classes of containers
+import copy                     # shallow copies
 import re                       # matching regular expressions
+import signal                   # alarms for bounding the time of matches
 import sys                      # system accessing
-import zipfile                  # zip files management
+import threading                # detection of the main thread
 
+import zwcactions
 import zwcconfig
+import zwckinds
+import zwcmatcher
+import zwcnfa
+import zwcoptimizer
+
+# constants
+# -----------------------------------------------------------------------------
+
+# backends used for matching the regular expressions of components
+BACKENDS = ("re", "linear")
+
+# options that can be given to the components of a schema along with their
+# default values
+OPTIONS = {
+    'subtree': False,
+    'batch': False,
+    'absolute': False,
+    'min': None,
+    'max': None,
+    'violation': None,
+    'required': False,
+    'parent': None,
+    'name': None
+}
+
+# -----------------------------------------------------------------------------
+# ZWCBudgetError
+#
+# Exception raised when matching a content exceeds its budget
+# -----------------------------------------------------------------------------
+class ZWCBudgetError (Exception):
+    """Exception raised when matching a content exceeds its budget
+
+    """
+
+    pass
+
+
+# -----------------------------------------------------------------------------
+# ZWCMissingError
+#
+# Exception raised when a required component does not match any content
+# -----------------------------------------------------------------------------
+class ZWCMissingError (SystemExit):
+    """Exception raised when a required component does not match any
+       content. It is derived from SystemExit so that it aborts the
+       evaluation of a zip file much the same as if-else functions do
+
+    """
+
+    pass
+
+
+# functions
+# -----------------------------------------------------------------------------
+
+# apply a function with a budget of time
+def budgeted (function, argument, budget):
+    """return the result of applying the given function to the argument. If it
+       takes more than budget seconds, ZWCBudgetError is raised. If no budget is
+       given, the function is applied with no limit.
+
+       Budgets are enforced with alarms, which are only available in the main
+       thread of Unix systems. Elsewhere, the function is applied with no limit
+
+    """
+
+    if not budget or not hasattr (signal, 'setitimer') or \
+       threading.current_thread () is not threading.main_thread ():
+        return function (argument)
+
+    # alarms received once the function has finished are ignored
+    armed = [True]
+    def alarm (signum, frame):
+        if armed[0]:
+            raise ZWCBudgetError ("the budget of {0} seconds has been exceeded".format (budget))
+
+    previous = signal.signal (signal.SIGALRM, alarm)
+    try:
+        signal.setitimer (signal.ITIMER_REAL, budget)
+        try:
+            return function (argument)
+        finally:
+            armed[0] = False
+            signal.setitimer (signal.ITIMER_REAL, 0)
+    finally:
+        signal.signal (signal.SIGALRM, previous)
+
+
+# record the directories of some contents
+def recordDirectories (contents, directories):
+    """return a generator with all the given contents, an iterable of strings,
+       which records in the given dictionary all their directories as they are
+       produced, e.g., 'a/' and 'a/b/' for 'a/b/c', in the same order they were
+       found. Every directory is mapped to whether it is given among the
+       contents as well, so that only directories are stored
+
+    """
+
+    for icontent in contents:
+        end = icontent.find ('/')
+        while end != -1 and end + 1 < len (icontent):
+            directories.setdefault (icontent[:end+1], False)
+            end = icontent.find ('/', end + 1)
+        if icontent.endswith ('/'):
+            directories[icontent] = True
+        yield icontent
+
 
 # -----------------------------------------------------------------------------
 # ZWCSchemaComponent
@@ -30,26 +142,184 @@ class ZWCSchemaComponent:
 
     """
 
-    def __init__ (self, configFile, regexp, if_then, if_else):
+    # components are created once and reused for all zip files so that their
+    # attributes are fixed in advance
+    __slots__ = ('_configFile', '_regexp', '_if_then', '_if_else', '_subtree',
+                 '_batch', '_root', '_min', '_max', '_violation', '_required', '_parent', '_name',
+                 '_action', '_groups', '_then', '_else', '_onViolation',
+                 '_pattern', '_engine', '_match',
+                 '_matches', '_errors', '_batched')
+
+    def __init__ (self, configFile, regexp, if_then, if_else, options=None, backend="re", root=None):
         """registers a single component with:
 
         configFile - configuration file given as an instance of ZWCConfigFile
 
         regexp - regular expression to be verified. It might contain
-                 groups to be used by other functions
+                 groups to be used by other functions. It can be given either as
+                 a string or as a compiled pattern. It can be also given as a
+                 typed component (see zwckinds), e.g., Exact or Prefix, which
+                 is resolved with indices instead
 
-        if_then - action to take in case of matching
+        if_then - action to take in case of matching. If it accepts a fifth
+                  argument, it also receives a dictionary with the named groups
+                  of the match. It can be also given as the name of a built-in
+                  action (see zwcactions), e.g., 'flag' or 'collect-basename',
+                  which is executed by the schema without invoking the
+                  configuration file. Its result is then given in the results
+                  of the schema (see ZWCSchema.getResult) with the name of this
+                  component
 
         if_else - action to take in case of no matching
 
+        options - dictionary with additional options of this component. The
+                  following are acknowledged:
+
+                  subtree - if true, whenever this component matches a
+                            directory, all its contents are considered to be
+                            matched by it as well, so that they are not
+                            examined individually when evaluating trees
+
+                  batch - if true, the if-then function is not invoked for
+                          every content matching this component. Instead, it
+                          is invoked only once after evaluating all contents,
+                          and it receives the list of pairs (content, groups)
+                          of all contents matching this component in the same
+                          order they were found, where groups is a dictionary
+                          with the named groups of the match
+
+                  absolute - if true, the regular expression is matched against
+                             the whole contents even if a root is given
+
+                  min - minimum number of contents that should match this
+                        component
+
+                  max - maximum number of contents that can match this
+                        component
+
+                  violation - function invoked instead of the if-else
+                              function when the number of matches is not
+                              within min and max. It receives this component
+                              as its only argument, as the if-else function
+
+                  required - if true, the schema verifies that this component
+                             matches at least one content before invoking any
+                             if-then function. Otherwise, its if-else function
+                             is invoked and the evaluation is aborted right
+                             away, unless this component is disabled as its
+                             parent is missing (see ZWCSchema.resolve)
+
+                  parent - name of another component this one depends
+                           upon. If no content matches the parent, this
+                           component is matched against no content and
+                           its if-else function is not invoked (see
+                           ZWCSchema.resolveParents). Directories of the
+                           contents are considered as well
+
+                  name - name of this component, used for accessing the result
+                         of its built-in action, if any. By default, its regular
+                         expression
+
+        backend - backend used for matching the regular expression: either
+                  're', which uses the re module, or 'linear', which simulates
+                  an automaton in time linear in the length of the contents. If
+                  the regular expression is not supported by the linear
+                  backend, the re module is used instead
+
+        root - compiled regular expression of the root directory of all
+               contents. If given, the regular expression of this component is
+               matched only against the contents after their root directory,
+               unless the option absolute is given. See ZWCSchema
+
         """
 
         # copy the attributes
         (self._configFile, self._regexp, self._if_then, self._if_else) = \
             (configFile, regexp, if_then, if_else)
 
-        # and initialize the number of matches to zero
-        self._matches = 0
+        # verify that all options are known and copy them
+        options = options or dict ()
+        for ioption in options:
+            if ioption not in OPTIONS:
+                print (" Fatal error: unknown option '{0}' in the component '{1}'".format (ioption, regexp))
+                sys.exit (1)
+        self._subtree = options.get ('subtree', OPTIONS['subtree'])
+        self._batch = options.get ('batch', OPTIONS['batch'])
+        self._required = options.get ('required', OPTIONS['required'])
+        self._parent = options.get ('parent', OPTIONS['parent'])
+        self._root = None if options.get ('absolute', OPTIONS['absolute']) else root
+
+        # verify that the cardinality constraints, if any, are non-negative
+        # integers which are consistent with each other
+        (self._min, self._max, self._violation) = (options.get ('min', OPTIONS['min']),
+                                                   options.get ('max', OPTIONS['max']),
+                                                   options.get ('violation', OPTIONS['violation']))
+        for ioption in ('min', 'max'):
+            value = options.get (ioption)
+            if value is not None and (not isinstance (value, int) or isinstance (value, bool) or value < 0):
+                print (" Fatal error: the option '{0}' of the component '{1}' is not a non-negative integer".format (ioption, regexp))
+                sys.exit (1)
+        if self._min is not None and self._max is not None and self._min > self._max:
+            print (" Fatal error: the option 'min' of the component '{0}' is greater than its option 'max'".format (regexp))
+            sys.exit (1)
+
+        # built-in actions are executed with their own function instead of
+        # invoking the configuration file. Otherwise, the named groups of
+        # matches are given to the if-then function only if it accepts them as
+        # a fifth argument
+        (self._action, self._groups) = (None, False)
+        if if_then in zwcactions.ACTIONS:
+            self._action = zwcactions.ACTIONS[if_then][1]
+        else:
+            self._groups = bool (if_then) and configFile.acceptsArguments (if_then, 5)
+
+        # resolve all functions of this component only once, so that they are
+        # invoked directly
+        (self._then, self._else, self._onViolation) = \
+            (configFile.getFunction (if_then) if if_then and not self._action else None,
+             configFile.getFunction (if_else) if if_else else None,
+             configFile.getFunction (self._violation) if self._violation else None)
+
+        # compile the regular expression only once so that evaluating contents
+        # does not depend upon the internal cache of the re module
+        # (note that re.compile returns precompiled patterns as they are)
+        try:
+            self._pattern = re.compile (regexp)
+        except (re.error, TypeError) as error:
+            print (" Fatal error: the regular expression '{0}' is not correct: {1}".format (regexp, error))
+            sys.exit (1)
+
+        # components are named after their regular expression unless a name is
+        # given
+        self._name = options.get ('name', OPTIONS['name'])
+        if self._name is None:
+            self._name = self._pattern.pattern
+
+        # select the engine used for matching contents, either an automaton or
+        # the compiled regular expression
+        (self._engine, self._match) = ("re", self._pattern.match)
+        if backend == "linear":
+            try:
+                (self._engine, self._match) = ("linear", zwcnfa.ZWCNFA (self._pattern).match)
+            except zwcnfa.ZWCNFAError:
+                pass
+
+        # and initialize the number of matches to zero, the list of contents
+        # whose matching exceeded their budget, and the list of contents
+        # matched for batch if-then functions
+        (self._matches, self._errors, self._batched) = (0, list (), list ())
+
+
+    def __repr__ (self):
+        """return the regular expression of this component as given in the schema,
+           or its typed component
+
+        """
+
+        if isinstance (self._regexp, zwckinds.ZWCKind):
+            return repr (self._regexp)
+
+        return "'{0}'".format (self._pattern.pattern)
 
 
     def __str__ (self):
@@ -58,7 +328,28 @@ class ZWCSchemaComponent:
         stream = """ configFile : {0}
  regexp     : {1}
  if_then    : {2}
- if_else    : {3}""".format (self._configFile.getNamespace (), self._regexp, self._if_then, self._if_else)
+ if_else    : {3}
+ engine     : {4}""".format (self._configFile.getNamespace (), repr (self._regexp) if isinstance (self._regexp, zwckinds.ZWCKind) else self._pattern.pattern, self._if_then, self._if_else, self._engine)
+
+        # show only those options whose value is not the default one
+        if self._root:
+            stream += "\n root       : {0}".format (self._root.pattern)
+        if self._subtree:
+            stream += "\n subtree    : {0}".format (self._subtree)
+        if self._batch:
+            stream += "\n batch      : {0}".format (self._batch)
+        if self._min is not None:
+            stream += "\n min        : {0}".format (self._min)
+        if self._max is not None:
+            stream += "\n max        : {0}".format (self._max)
+        if self._violation:
+            stream += "\n violation  : {0}".format (self._violation)
+        if self._required:
+            stream += "\n required   : {0}".format (self._required)
+        if self._parent is not None:
+            stream += "\n parent     : {0}".format (self._parent)
+        if self._name != self._pattern.pattern:
+            stream += "\n name       : {0}".format (self._name)
 
         return stream
 
@@ -69,21 +360,203 @@ class ZWCSchemaComponent:
         return self._matches
     
 
+    def getErrors (self):
+        """return the list of contents whose matching with this component exceeded
+           their budget
+
+        """
+
+        return self._errors
+
+
+    def isSubtree (self):
+        """return whether this component matches whole subtrees"""
+
+        return self._subtree
+
+
+    def isBatch (self):
+        """return whether the if-then function of this component is invoked only
+           once with all the contents matching it
+
+        """
+
+        return self._batch
+
+
+    def isRequired (self):
+        """return whether this component has to match at least one content"""
+
+        return self._required
+
+
+    def getParent (self):
+        """return the name of the component this one depends upon, or None if
+           there is none
+
+        """
+
+        return self._parent
+
+
+    def getMin (self):
+        """return the minimum number of matches of this component, or None if there
+           is none
+
+        """
+
+        return self._min
+
+
+    def getMax (self):
+        """return the maximum number of matches of this component, or None if there
+           is none
+
+        """
+
+        return self._max
+
+
+    def getName (self):
+        """return the name of this component"""
+
+        return self._name
+
+
+    def getAction (self):
+        """return the name of the built-in action of this component, or None if it
+           is given no built-in action
+
+        """
+
+        return self._if_then if self._action else None
+
+
+    def isViolated (self):
+        """return whether the number of matches of this component is not within its
+           minimum and maximum number of matches
+
+        """
+
+        return (self._min is not None and self._matches < self._min) or \
+            (self._max is not None and self._matches > self._max)
+
+
+    def getEngine (self):
+        """return the name of the engine used for matching contents: 're' if the
+           re module is used, and 'linear' if an automaton is simulated instead
+
+        """
+
+        return self._engine
+
+
+    def getMatchFunction (self):
+        """return the function used for matching contents. It returns either None or
+           a match object which provides, at least, the methods group, groups and
+           groupdict
+
+        """
+
+        return self._match
+
+
+    def getPattern (self):
+        """return the compiled regexp defined in this component"""
+
+        return self._pattern
+
+
     def getRegexp (self):
         """return the regexp defined in this component"""
 
         return self._regexp
+
+
+    def getRoot (self):
+        """return the compiled regexp of the root directory this component is
+           relative to, or None if it is matched against whole contents
+
+        """
+
+        return self._root
+
+
+    def getFullRegexp (self):
+        """return the regexp matched by whole contents, i.e., the regexp of the root
+           directory followed by the regexp of this component if it is relative
+           to a root, and the regexp of this component otherwise
+
+        """
+
+        if self._root:
+            return self._root.pattern + self._pattern.pattern
+
+        return self._regexp
     
 
-    def evaluate (self, instance):
+    def matchContent (self, content):
+        """return the match object of this component with the given content, or
+           None if it does not match it. Unlike the match function of this
+           component, the content is given in full, so that it is matched
+           against the root directory of this component first, if any
+
+        """
+
+        if self._root:
+            slash = content.find ('/')
+            if slash == -1 or not self._root.fullmatch (content[:slash+1]):
+                return None
+            return self._match (content[slash+1:])
+
+        return self._match (content)
+
+
+    def clone (self):
+        """return a copy of this component with no matches, errors nor contents
+           collected, so that it can be used with another zip file at the same
+           time. Its compiled regular expression and functions are shared
+
+        """
+
+        component = copy.copy (self)
+        component.reset ()
+
+        return component
+
+
+    def addMatch (self):
+        """increments the number of matches of this component"""
+
+        self._matches += 1
+
+
+    def reset (self):
+        """reset the number of matches of this component and its list of errors so
+           that it can be used with another zip file
+
+        """
+
+        (self._matches, self._errors, self._batched) = (0, list (), list ())
+
+
+    def evaluate (self, instance, budget=None):
         """returns whether the given instance is verified by this component. If so, the
-           number of matches is incremented
+           number of matches is incremented.
+
+           If a budget is given, matching the instance can take at most budget
+           seconds. Otherwise, the instance is considered not to match, and it
+           is recorded as an error of this component
 
         """
 
         # apply the regular expression of this component to this
         # instance
-        m = re.match (self._regexp, instance)
+        try:
+            m = budgeted (self._match, instance, budget)
+        except ZWCBudgetError:
+            self._errors.append (instance)
+            return False
 
         # if necessary, update the number of matches
         if m:
@@ -93,41 +566,62 @@ class ZWCSchemaComponent:
         return m != None
     
 
-    def executeIfThen (self, zipstream, content):
+    def executeIfThen (self, zipstream, content, groups=None):
         """execute the if-then registered function of this component for the content
-           that matched it and the zipstream from where it was extracted
+           that matched it and the zipstream from where it was extracted. The
+           named groups of the match are given as well if the if-then function
+           accepts them
 
         """
 
-        # execute the if-then function registered for this component within the
-        # configuration file. For this, create a context with the values of all
-        # parameters passed to the if-then function
-        command = """{0}.{1} (zipstream, regexp, content, matches)""".format (self._configFile.getNamespace (),
-                                                                              self._if_then)
-        context = {
-            'zipstream' : zipstream,
-            'regexp' : self._regexp,
-            'content' : content,
-            'matches' : self._matches
-        }
-        self._configFile.execute (command, context)
+        # invoke the if-then function registered for this component, which was
+        # resolved when creating it
+        if self._groups:
+            self._then (zipstream, self.getFullRegexp (), content, self._matches, groups)
+        else:
+            self._then (zipstream, self.getFullRegexp (), content, self._matches)
     
 
+    def collect (self, content, groups):
+        """record that the given content matched this component with the given
+           named groups, so that it is given to the batch if-then function
+
+        """
+
+        self._batched.append ((content, groups))
+
+
+    def executeIfThenBatch (self, zipstream):
+        """execute the batch if-then registered function of this component for all
+           the contents that matched it, given as a list of pairs (content,
+           groups), and the zipstream from where they were extracted. If the
+           if-then function accepts a fifth argument, it receives None
+
+        """
+
+        self.executeIfThen (zipstream, self._batched)
+
+
     def executeIfElse (self):
         """execute the if-else registered function of this component for the content
            that matched it and the zipstream from where it was extracted
 
         """
 
-        # execute the if-else function registered for this component within the
-        # configuration file. For this, create a context with the values of all
-        # parameters passed to the if-else function
-        command = """{0}.{1} (component)""".format (self._configFile.getNamespace (),
-                                                    self._if_else)
-        context = {
-            'component' : self
-        }
-        self._configFile.execute (command, context)
+        # invoke the if-else function registered for this component, which was
+        # resolved when creating it
+        self._else (self)
+
+
+    def executeViolation (self):
+        """execute the violation registered function of this component, which did not
+           match as many contents as required
+
+        """
+
+        # invoke the violation function registered for this component with the
+        # same parameters given to if-else functions
+        self._onViolation (self)
     
 
 # -----------------------------------------------------------------------------
@@ -139,7 +633,8 @@ class ZWCSchema:
 
     """Definition of a schema to use for verifying the contents of a zip file"""
 
-    def __init__ (self, zipstream, schema, configFile):
+    def __init__ (self, zipstream, schema, configFile, engine="sequential", backend="re", budget=None,
+                  cache=0, root=None, optimize=True, stats=None, compiled=False, check=False):
         """Initializes a schema for processing a zipfile from the contents of a list of
            tuples using those definitions specified in the given configuration
            file ---given as an instance of ZWCConfigFile
@@ -148,6 +643,71 @@ class ZWCSchema:
            could be anything (even None). It is only used as a parameter given
            to if-then functions
 
+           The engine is the name of the matching engine used to find the
+           component matched by each content, one of those given in
+           zwcmatcher.engines
+
+           The backend is used for matching the regular expressions of all
+           components, either 're' or 'linear' (see ZWCSchemaComponent)
+
+           If a budget is given, finding the component matched by each content
+           can take at most budget seconds. Otherwise, the content is considered
+           to match no component, and it is recorded as an error of the schema
+
+           Schemas can be reused for evaluating the contents of different zip
+           files. For this, invoke reset with every new zipstream before
+           evaluating its contents
+
+           The result of matching the last contents (at most cache) is
+           cached, so that contents found in many zip files (e.g., __MACOSX/)
+           are matched only once. The cache is shared with all schemas with
+           the same components (see zwcmatcher.cache). If cache is zero, the
+           default, nothing is cached
+
+           If a root is given, as a regular expression, it is matched only
+           once against every distinct top-level directory (up to its first
+           slash, included) and the regular expressions of components are
+           matched only against the rest of the contents, unless they are
+           given the option absolute. The named groups of the root are then
+           merged with those of components. Contents whose top-level directory
+           does not match the root can only match absolute components
+
+           If optimize is true, components which can never match any content,
+           as all contents they match are matched first by a preceding
+           component, are reported with a warning and they are not matched
+           at all. The other ones are matched in an order where the cheapest
+           ones come first, provided that the first component matching every
+           content is still the same (see zwcoptimizer.plan)
+
+           If statistics are given, as an instance of zwcstats.ZWCStats, the
+           components which matched more contents in previous runs are matched
+           first instead (if optimize is true). The number of hits and
+           attempts of all components are recorded in the statistics with
+           recordStats
+
+           If compiled is true, evaluate uses a python function generated for
+           this schema, where all components are matched in the order of the
+           plan with their functions bound to local variables (see
+           zwccompiler). It does not use the cache, and it is not used if a
+           budget is given. If check is true as well, the component matched by
+           every content is verified against the matcher of the schema
+
+           If any component is required, all contents are examined first to
+           verify that every required component matches at least one of them
+           before invoking any if-then function (see resolve)
+
+           Components can depend upon a parent component. If no content
+           matches the parent, all the components depending upon it are
+           disabled: they are matched against no content and their if-else
+           functions are not invoked (see resolveParents). Directories with
+           no explicit entry are considered as well, so that the same
+           components are disabled with evaluate and evaluateTree
+
+           Schemas evaluate the contents of only one zip file at a time. To
+           evaluate different zip files at the same time, e.g., with a pool
+           of threads, every thread should use its own copy of the schema
+           (see clone)
+
         """
 
         # error checking - verify that the given schema is a list
@@ -161,33 +721,179 @@ class ZWCSchema:
             sys.exit (1)
         
         # error checking - verify now that all items of the schema are given as
-        # tuples with precisely three items each
+        # tuples with precisely three items each, and an optional fourth item
+        # with a dictionary of options
         for ischema in schema:
             if not isinstance (ischema, tuple):
                 print (" Fatal error: the component '{0}' has not been given as a tuple".format (ischema))
                 sys.exit (1)
 
-            if len (ischema) != 3:
+            if len (ischema) not in (3, 4):
                 print (" Fatal error: the component '{0}' has an incorrect number of arguments".format (ischema))
                 sys.exit (1)
 
+            if len (ischema) == 4 and not isinstance (ischema[3], dict):
+                print (" Fatal error: the options of the component '{0}' have not been given as a dictionary".format (ischema))
+                sys.exit (1)
+
         # error checking - verify the config file has been given as an instance
         # of ZWCConfigFile
         if not isinstance (configFile, zwcconfig.ZWCConfigFile):
             print (" Fatal error: the config file is not an instance of a ZWCConfigFile")
             sys.exit (1)
+
+        # error checking - verify the engine is known
+        if engine not in zwcmatcher.engines:
+            print (" Fatal error: unknown matching engine '{0}'".format (engine))
+            sys.exit (1)
+
+        # error checking - verify the backend is known
+        if backend not in BACKENDS:
+            print (" Fatal error: unknown matching backend '{0}'".format (backend))
+            sys.exit (1)
                         
-        # copy the zipstream and the configuration file
+        # error checking - verify the size of the cache is not negative
+        if not isinstance (cache, int) or cache < 0:
+            print (" Fatal error: the size of the cache '{0}' is not a non-negative integer".format (cache))
+            sys.exit (1)
+
+        # error checking - verify the budget is a positive number of seconds
+        if budget is not None and (not isinstance (budget, (int, float)) or budget <= 0):
+            print (" Fatal error: the budget '{0}' is not a positive number of seconds".format (budget))
+            sys.exit (1)
+
+        # error checking - verify the root is a correct regular expression
+        if root is not None:
+            try:
+                root = re.compile (root)
+            except (re.error, TypeError) as error:
+                print (" Fatal error: the regular expression of the root '{0}' is not correct: {1}".format (root, error))
+                sys.exit (1)
+
+        # copy the zipstream, the configuration file and the budget
         self._zipstream = zipstream
         self._configFile = configFile
+        self._budget = budget
+
+        # and initialize the list of contents whose matching exceeded the budget
+        self._errors = list ()
 
         # create a container with schema components of all tuples given in the
         # schema
         self._components = list ()
         for ischema in schema:
-            self._components.append (ZWCSchemaComponent (configFile,
-                                                         ischema[0], ischema[1], ischema[2]))
-            
+            self._components.append (ZWCSchemaComponent (configFile, *ischema, backend=backend, root=root))
+
+        # error checking - verify that components with the same name do not
+        # have different built-in actions, as their results are shared
+        actions = dict ()
+        for icomponent in self._components:
+            action = icomponent.getAction ()
+            if action and actions.setdefault (icomponent.getName (), action) != action:
+                print (" Fatal error: the components named '{0}' have different built-in actions".format (icomponent.getName ()))
+                sys.exit (1)
+
+        # and initialize the results of the built-in actions
+        self._result = zwcactions.ZWCResult (self._components)
+
+        # error checking - verify that the parents of all components are known
+        # and that no component depends upon itself, and compute the order in
+        # which parents are resolved, i.e., with all parents before their
+        # children
+        (self._parents, self._hierarchy) = (dict (), list ())
+        names = dict ()
+        for index, icomponent in enumerate (self._components):
+            names.setdefault (icomponent.getName (), list ()).append (index)
+        for index, icomponent in enumerate (self._components):
+            if icomponent.getParent () is not None:
+                if icomponent.getParent () not in names:
+                    print (" Fatal error: the parent '{0}' of the component '{1}' is not the name of any component".format (icomponent.getParent (), icomponent.getName ()))
+                    sys.exit (1)
+                self._parents[index] = names[icomponent.getParent ()]
+        (visited, ancestors) = (set (), list ())
+        def visit (index):
+            if index in ancestors:
+                print (" Fatal error: the component '{0}' depends upon itself".format (self._components[index].getName ()))
+                sys.exit (1)
+            if index not in visited:
+                ancestors.append (index)
+                for iparent in self._parents.get (index, []):
+                    visit (iparent)
+                ancestors.pop ()
+                visited.add (index)
+                if index in self._parents:
+                    self._hierarchy.append (index)
+        for index in self._parents:
+            visit (index)
+
+        # compute the plan for matching the components, i.e., the order in
+        # which they are matched, and report those which are unreachable only
+        # once per configuration file. If statistics are given, the frequency
+        # of hits of all components is taken into account
+        self._stats = stats
+        self._frequencies = [stats.getFrequency (icomponent) for icomponent in self._components] if stats else None
+        (self._plan, self._unreachable) = (list (range (len (self._components))), dict ())
+        if optimize:
+            (self._plan, self._unreachable) = zwcoptimizer.plan (self._components, self._frequencies)
+            for index, ishadow in sorted (self._unreachable.items ()):
+                configFile.warn ("the component {0} can never match any content as all the contents it matches are matched first by the component {1}".format (repr (self._components[index]),
+                                                                                                                                                           repr (self._components[ishadow])))
+
+        # create the matcher of all components in the order of the plan, along
+        # with the cache shared by all schemas with these components. They
+        # are used unless some components are disabled as their parents are
+        # missing (see resolveParents), and then other matchers are created
+        # with the rest of components
+        (self._engine, self._root, self._size, self._lock) = (engine, root, cache, threading.Lock ())
+        self._variants = {frozenset (): (self.createMatcher (self._plan), self._plan,
+                                         zwcmatcher.cache (self._components, cache) if cache else None)}
+        self.select (frozenset ())
+
+        # record the components which are required to match any content
+        self._required = [index for index, icomponent in enumerate (self._components) if icomponent.isRequired ()]
+
+        # initialize the number of hits of every component and the number
+        # of contents matched since the statistics were last recorded
+        (self._hits, self._attempts) = ([0] * len (self._components), 0)
+
+        # and finally generate the evaluator specialized for this schema, if
+        # requested. Budgets are only enforced by the generic evaluator
+        (self._factory, self._evaluator) = (None, None)
+        if compiled and budget:
+            print (" Warning: the compiled evaluator does not enforce budgets and thus it is not used")
+        elif compiled:
+
+            # the compiler is imported only if it is used, as it takes long to
+            # be imported
+            import zwccompiler
+            self._factory = zwccompiler.factory (self, check)
+            self._evaluator = zwccompiler.evaluator (self, self._factory)
+
+    def clone (self):
+        """return a copy of this schema which can evaluate the contents of a zip
+           file while this one evaluates another, e.g., in a different
+           thread. Its components are copied with no matches, and it has its
+           own results and errors. Instead, the configuration file, the plan,
+           the matchers and their caches and the statistics are shared, so
+           that copies are created quickly. The number of hits of every copy
+           has to be recorded separately (see recordStats)
+
+        """
+
+        schema = copy.copy (self)
+        schema._components = [icomponent.clone () for icomponent in self._components]
+        (schema._zipstream, schema._errors) = (None, list ())
+        schema._result = zwcactions.ZWCResult (schema._components)
+        (schema._hits, schema._attempts) = ([0] * len (self._components), 0)
+        schema.select (frozenset ())
+
+        # the compiled evaluator, if any, is bound to the components of the copy
+        if self._factory:
+            import zwccompiler
+            schema._evaluator = zwccompiler.evaluator (schema, self._factory)
+
+        return schema
+
 
     def __str__ (self):
         """provides a human readable version of this schema"""
@@ -196,48 +902,596 @@ class ZWCSchema:
         for component in self._components:
             stream += component.__str__ () + "\n\n"
 
+        # show also the plan for matching the components
+        stream += " plan       : {0}\n".format (self._matcher)
+        for position, index in enumerate (self._plan):
+            stream += " {0:>10} : [{1}] {2}".format (position + 1, index, self._components[index].getName ())
+            if self._frequencies:
+                stream += " ({0:.2%} of {1} contents)".format (self._frequencies[index], self._stats.getAttempts (self._components[index]))
+            stream += "\n"
+        for index, ishadow in sorted (self._unreachable.items ()):
+            stream += " unreachable: [{0}] {1} (shadowed by [{2}])\n".format (index, self._components[index].getName (), ishadow)
+
         return stream
 
     
     def evaluate (self, contents):
-        """return whether the given contents are compliant with this schema"""
+        """return whether the given contents are compliant with this schema. Contents
+           can be given as any iterable of strings (e.g., a generator) and they
+           are evaluated as they are produced, so that they are never stored in
+           memory
+
+           If any component is required or depends upon another one, contents
+           are examined first to resolve the parents of all components and to
+           verify that all required components match any content, as no if-then
+           function can be invoked before (see resolve). Only the components
+           still missing are recorded meanwhile. Contents are then traversed
+           again to evaluate them, so that they are stored only if they are
+           given as an iterator (e.g., a generator), which can not be traversed
+           twice. Use instead iterables that produce them anew, e.g., ZWCNames
+
+           If this schema was created with a compiled evaluator, it is used
+           instead once parents and required components have been resolved
+
+        """
+
+        # resolve first the parents of all components and verify that all
+        # required components are matched, if any
+        if self._required or self._parents:
+            if isinstance (contents, collections.abc.Iterator):
+                contents = list (contents)
+            self.resolve (contents)
+
+        if self._evaluator:
+            return self._evaluator (self, contents)
+
+        # evaluation is done in cooperation with the components of the
+        # schema. While the components verify whether a specific content matches
+        # it, it is the schema which takes care of consistency as a whole. Note
+        # that every content is verified to be a string right before matching it
+        for icontent in self.verifiedContents (contents):   # for each content
+
+            # if any component matched this content
+            result = self.match (icontent)
+            if result:
+
+                # if this component matched this content, then record the
+                # match and apply its if-then function if any was given, unless
+                # it is invoked in batch. Built-in actions are executed right
+                # away, and components with no if-then function (e.g., those
+                # with cardinality constraints only) just count their matches
+                icomponent = self._components[result[0]]
+                icomponent.addMatch ()
+                if icomponent._action:
+                    self._result.record (icomponent._name, icomponent._action, icontent)
+                elif icomponent._if_then:
+                    if not icomponent.isBatch ():
+                        icomponent.executeIfThen (self._zipstream, icontent, result[1])
+                    else:
+                        icomponent.collect (icontent, result[1])
+
+        # invoke the batch if-then functions of all components that matched
+        # and verify whether there are components of this schema that have not
+        # matched or that violate their cardinality constraints
+        self.executeIfThenBatch ()
+        self.executeIfElse ()
+
+
+    def evaluateTree (self, contents):
+        """return whether the given contents are compliant with this schema. Unlike
+           evaluate, contents are arranged in a tree of paths which is traversed
+           in depth-first order, directories first. Every directory is evaluated
+           even if there is no explicit entry for it among the contents, and if
+           it is matched by a component that matches whole subtrees, then its
+           contents are not examined. Contents can be given as any iterable of
+           strings, though all of them are stored in the tree.
+
+           The contents given to if-then functions are instances of ZWCNode, so
+           that they can access the number of files and directories under them
+
+        """
+
+        # create the tree of paths, verifying that all contents are strings,
+        # resolve the parents of all components and verify that all required
+        # components are matched by any node, if any. Nodes under subtrees are
+        # considered as well, so that parents and required components found
+        # only there are handled once the whole tree has been traversed
+        root = ZWCNode.build (self.verifiedContents (contents))
+        if self._required or self._parents:
+            self.resolve (list (root.getDescendants ()))
+
+        # traverse the tree in depth-first order. Nodes are pushed in reverse
+        # order so that they are popped in the same order they were found
+        nodes = list (reversed (root.getChildren ()))
+        while nodes:
+
+            inode = nodes.pop ()
+
+            # find the first component matching this node, if any
+            result = self.match (inode)
+            if result:
+
+                # if this component matched this node, then record the match
+                # and apply its if-then function if any was given, unless it
+                # is invoked in batch. Built-in actions are executed right away,
+                # and components with no if-then function just count their
+                # matches
+                icomponent = self._components[result[0]]
+                icomponent.addMatch ()
+                if icomponent._action:
+                    self._result.record (icomponent._name, icomponent._action, inode)
+                elif icomponent._if_then:
+                    if not icomponent.isBatch ():
+                        icomponent.executeIfThen (self._zipstream, inode, result[1])
+                    else:
+                        icomponent.collect (inode, result[1])
+
+                # in case this component matches whole subtrees, skip all the
+                # contents of this node
+                if icomponent.isSubtree ():
+                    continue
+
+            # and proceed with the contents of this node
+            nodes.extend (reversed (inode.getChildren ()))
+
+        # invoke the batch if-then functions of all components that matched
+        # and verify whether there are components of this schema that have not
+        # matched or that violate their cardinality constraints
+        self.executeIfThenBatch ()
+        self.executeIfElse ()
+
+
+    def findMissing (self, contents, indices):
+        """return the list of all the given indices of components which do not
+           match any of the given contents, i.e., which are not the first
+           component matching any of them. Contents are first matched only
+           against the components still missing, so that they are matched
+           against the whole schema only if any of them matches. Once all
+           components have been found, no more contents are examined
+
+           Neither the number of matches of components nor their statistics
+           are modified, and contents exceeding the budget are considered to
+           match no component
+
+        """
+
+        missing = list (indices)
+        for icontent in contents:
+
+            if not missing:
+                break
+
+            try:
+
+                # if any required component matches this content, verify it is
+                # the first one matching it
+                if any (budgeted (self._components[index].matchContent, icontent, self._budget) for index in missing):
+                    result = budgeted (self._matcher.match, icontent, self._budget)
+                    if result and self._positions[result[0]] in missing:
+                        missing.remove (self._positions[result[0]])
+
+            except ZWCBudgetError:
+                pass
+
+        return missing
+
+
+    def resolve (self, contents):
+        """resolve the parents of all components and verify that all required
+           components match any of the given contents, given as an iterable
+           which can be traversed several times, e.g., the nodes of a tree
+           (see resolveParents and checkRequired). Contents are verified to be
+           strings as they are examined.
+
+           Both parents and required components are found with a single pass
+           over contents, where only those matching any of them are matched
+           against all components, and which stops once all of them have been
+           found (see findMissing). Contents are examined again only if any
+           required component is missing and other components have been
+           disabled, as it might match the contents of those
+
+        """
+
+        # the directories of contents are recorded as they are examined, which
+        # only stops once all parents have been found, and thus when no
+        # directory is needed
+        self.select (frozenset ())
+        directories = dict ()
+        missing = self.findMissing (recordDirectories (self.verifiedContents (contents), directories),
+                                    sorted (set (iparent for iparents in self._parents.values () for iparent in iparents) |
+                                            set (self._required)))
+        self.resolveParents ([idirectory for idirectory, explicit in directories.items () if not explicit], missing)
+
+        missing = [index for index in self._required if index in missing and index not in self._disabled]
+        if missing and self._disabled:
+            missing = self.findMissing (self.verifiedContents (contents), missing)
+        self.checkRequired (missing)
+
+
+    def resolveParents (self, directories, missing):
+        """disable all components whose parent is among the given indices of
+           components missing from contents (see findMissing), or is disabled
+           itself, so that contents are matched only against the rest of
+           components and children are never matched if their parent is
+           missing. Missing parents are first searched among the given
+           directories of contents with no explicit entry (see
+           recordDirectories)
+
+        """
+
+        if not self._parents:
+            return
+
+        absent = [index for index in missing if any (index in iparents for iparents in self._parents.values ())]
+        if absent:
+            absent = self.findMissing (directories, absent)
+        absent = set (absent)
+
+        # note that components with the same name are considered to be the same
+        # parent, so that it is missing only if all of them are missing
+        disabled = set ()
+        for index in self._hierarchy:
+            if all (iparent in absent or iparent in disabled for iparent in self._parents[index]):
+                disabled.add (index)
+
+        self.select (frozenset (disabled))
+
+
+    def select (self, disabled):
+        """match contents only against the components which are not disabled,
+           given as a frozenset of their indices. Matchers are created only
+           once for every set of disabled components, and they are given
+           their own cache. They are shared by all copies of this schema
+
+        """
+
+        with self._lock:
+            if disabled not in self._variants:
+                positions = [index for index in self._plan if index not in disabled]
+                self._variants[disabled] = (self.createMatcher (positions), positions,
+                                            zwcmatcher.ZWCCache (self._size) if self._size else None)
+
+        (self._matcher, self._positions, self._cache) = self._variants[disabled]
+        self._disabled = disabled
+
+
+    def createMatcher (self, positions):
+        """return a matcher of the components with the given indices, in the
+           same order. If a root is given, relative and absolute components
+           are matched separately, and if there are typed components, they are
+           resolved with indices and the engine is used only for the others
+
+        """
+
+        def create (components):
+            if any (isinstance (icomponent.getRegexp (), zwckinds.ZWCKind) for icomponent in components):
+                return zwckinds.ZWCKindMatcher (components, zwcmatcher.engines[self._engine])
+            return zwcmatcher.engines[self._engine] (components)
+
+        components = [self._components[index] for index in positions]
+        if self._root:
+            return zwcmatcher.ZWCRootMatcher (components, create, self._root)
+
+        return create (components)
+
+
+    def checkRequired (self, missing):
+        """verify that no required component is among the given indices of
+           components missing from the contents (see findMissing). Otherwise,
+           the if-else function of all those which are missing is invoked, in
+           the same order they were given in the schema, and ZWCMissingError
+           is raised so that the evaluation is aborted before invoking any
+           if-then function. Required components disabled as their parent is
+           missing are not verified
+
+        """
+
+        missing = [index for index in self._required if index in missing and index not in self._disabled]
+        for index in missing:
+            if self._components[index]._if_else:
+                self._components[index].executeIfElse ()
+
+        if missing:
+            raise ZWCMissingError ("the required components {0} did not match any content".format (", ".join ("'{0}'".format (self._components[index].getName ())
+                                                                                                                for index in missing)))
+
+
+    def getErrors (self):
+        """return the list of contents whose matching exceeded the budget"""
+
+        return self._errors
+
+
+    def recordStats (self):
+        """add the number of hits and attempts of all components since the last
+           call to the statistics of this schema, if any were given. Note that
+           statistics are not written to their file
+
+        """
+
+        if self._stats:
+            for index, icomponent in enumerate (self._components):
+                self._stats.record (icomponent, self._hits[index], self._attempts)
+
+        (self._hits, self._attempts) = ([0] * len (self._components), 0)
+
+
+    def getResult (self):
+        """return the results of the built-in actions of all components for the
+           last zip file, an instance of zwcactions.ZWCResult
+
+        """
+
+        return self._result
+
 
-        # -- error checking - verify that the contents are given as a list of
-        #                     strings
-        if not isinstance (contents, list):
-            print (" Fatal error: the contents '{0}' have not been given as a list".format (contents))
+    def reset (self, zipstream):
+        """prepare this schema for evaluating the contents of another zipstream: the
+           number of matches of all components, the list of errors and the
+           results of built-in actions are reset, and zipstream is given to
+           if-then functions from now on. Note that results are created anew so
+           that those of previous zip files can be kept. All components are
+           enabled again
+
+        """
+
+        self.select (frozenset ())
+        self._zipstream = zipstream
+        self._errors = list ()
+        self._result = zwcactions.ZWCResult (self._components)
+        for icomponent in self._components:
+            icomponent.reset ()
+
+
+    def getCache (self):
+        """return the cache of this schema, an instance of zwcmatcher.ZWCCache, or
+           None if no cache is used
+
+        """
+
+        return self._cache
+
+
+    def match (self, content):
+        """return a tuple with the index of the first component matching the given
+           content and a dictionary with its named groups, or None if there is
+           none. If the budget is exceeded, the content is recorded as an error
+           and None is returned
+
+        """
+
+        # contents already matched are not matched again
+        self._attempts += 1
+        if self._cache:
+            result = self._cache.get (content)
+            if result is not zwcmatcher.MISS:
+                if result:
+                    self._hits[result[0]] += 1
+                return result
+
+        try:
+            result = budgeted (self._matcher.match, content, self._budget)
+        except ZWCBudgetError:
+            self._errors.append (content)
+            return None
+
+        # only the named groups are retained so that results do not depend on
+        # the engine used, and the position of the component in the plan is
+        # translated into its index in the schema
+        if result:
+            result = (self._positions[result[0]], self._matcher.groups (*result))
+            self._hits[result[0]] += 1
+
+        # contents are cached as plain strings, so that nodes (see ZWCNode) do
+        # not keep their whole tree alive in caches shared across zip files
+        if self._cache:
+            self._cache.put (content if type (content) is str else str (content), result)
+
+        return result
+
+
+    def verifiedContents (self, contents):
+        """return a generator with all the given contents, which are verified to be
+           strings as they are produced. Otherwise, a fatal error is raised. A
+           fatal error is also raised if contents is not an iterable
+
+        """
+
+        if isinstance (contents, str):
+            print (" Fatal error: the contents '{0}' have not been given as an iterable of strings".format (contents))
+            sys.exit (1)
+
+        try:
+            contents = iter (contents)
+        except TypeError:
+            print (" Fatal error: the contents '{0}' have not been given as an iterable".format (contents))
             sys.exit (1)
 
         for icontent in contents:
             if not isinstance (icontent, str):
                 print (" Fatal error: the content '{0}' is not a string".format (icontent))
                 sys.exit (1)
-        
-        # evaluation is done in cooperation with the components of the
-        # schema. While the components verify whether a specific content matches
-        # it, it is the schema which takes care of consistency as a whole
-        for icontent in contents:                            # for each content
+            yield icontent
 
-            for icomponent in self._components:            # for each component
 
-                # if this component matches this content
-                if icomponent.evaluate (icontent):
+    def verifyContents (self, contents):
+        """verifies that the given contents are an iterable of strings. Otherwise, a
+           fatal error is raised
+
+        """
+
+        for icontent in self.verifiedContents (contents):
+            pass
 
-                    # if this component matched this content, then apply its
-                    # if-then function if any was given
-                    icomponent.executeIfThen (self._zipstream, icontent)
-                    break
 
-        # verify whether there are components of this schema that have not matched
+    def executeIfThenBatch (self):
+        """execute the batch if-then functions of all components that matched any
+           content
+
+        """
+
         for icomponent in self._components:
 
-            # if this specific component never matched any entry of the zip file
-            # invoke its if-else function
-            if not icomponent.getMatches () and icomponent._if_else:
+            if icomponent.isBatch () and icomponent.getMatches () and icomponent._if_then and \
+               not icomponent._action:
+
+                icomponent.executeIfThenBatch (self._zipstream)
+
+
+    def executeIfElse (self):
+        """execute the if-else functions of all components that did not match any
+           content or whose number of matches violates their cardinality
+           constraints. In the latter case, their violation function is
+           executed instead, if any was given. Components disabled as their
+           parents are missing are skipped
+
+        """
+
+        for index, icomponent in enumerate (self._components):
+
+            if index in self._disabled:
+                continue
+
+            # if this specific component violates its cardinality constraints,
+            # invoke its violation function if any was given
+            violated = icomponent.isViolated ()
+            if violated and icomponent._violation:
+
+                icomponent.executeViolation ()
+
+            # otherwise, if it never matched any entry of the zip file or it
+            # violates its constraints, invoke its if-else function
+            elif (violated or not icomponent.getMatches ()) and icomponent._if_else:
 
                 icomponent.executeIfElse ()
-            
-            
+
+
+# -----------------------------------------------------------------------------
+# ZWCNames
+#
+# Names of all the entries of a zip file
+# -----------------------------------------------------------------------------
+class ZWCNames:
+    """Names of all the entries of a zip file, in the same order they are found
+       in its directory. They are produced anew every time they are traversed,
+       so that schemas can examine them several times without storing them
+       (see ZWCSchema.evaluate)
+
+    """
+
+    def __init__ (self, zipstream):
+        """creates the names of all the entries of the given zipstream, an instance
+           of zipfile.ZipFile
+
+        """
+
+        self._zipstream = zipstream
+
+
+    def __iter__ (self):
+        """return a generator with the names of all the entries of the zip file"""
+
+        return (iinfo.filename for iinfo in self._zipstream.infolist ())
+
+
+# -----------------------------------------------------------------------------
+# ZWCNode
+#
+# Definition of a node in the tree of paths of a zip file
+# -----------------------------------------------------------------------------
+class ZWCNode (str):
+    """Definition of a node in the tree of paths of a zip file. Nodes are strings
+       with the full path of either a file or a directory (which always end with
+       a slash) so that they can be used wherever contents are expected, e.g.,
+       when opening them in the zip file. In addition, they provide access to
+       their children and the number of files and directories under them
+
+    """
+
+    def __new__ (cls, path):
+        """creates a new node with the given path and no contents"""
+
+        node = str.__new__ (cls, path)
+        (node._children, node._files, node._directories) = (dict (), 0, 0)
+        return node
+
+
+    @staticmethod
+    def build (contents):
+        """return the root of a tree with all the paths given in contents, an
+           iterable of strings. The root has an empty path, and all directories
+           in the contents are present in the tree, even if they have no
+           explicit entry
+
+        """
+
+        root = ZWCNode ("")
+        for icontent in contents:
+
+            # traverse all the directories of this content, creating them if
+            # necessary
+            (inode, ancestors, start) = (root, [root], 0)
+            end = icontent.find ('/')
+            while end != -1:
+                child = inode._children.get (icontent[start:end+1])
+                if child is None:
+                    child = ZWCNode (icontent[:end+1])
+                    inode._children[icontent[start:end+1]] = child
+                    for iancestor in ancestors:
+                        iancestor._directories += 1
+                (inode, start) = (child, end + 1)
+                ancestors.append (inode)
+                end = icontent.find ('/', start)
+
+            # and add the file, if this content is not a directory
+            if start < len (icontent) and icontent[start:] not in inode._children:
+                inode._children[icontent[start:]] = ZWCNode (icontent)
+                for iancestor in ancestors:
+                    iancestor._files += 1
+
+        return root
+
+
+    def getChildren (self):
+        """return a list with the children of this node in the same order they were
+           found
+
+        """
+
+        return list (self._children.values ())
+
+
+    def getDescendants (self):
+        """return a generator with all the nodes under this one (but this one) in
+           depth-first order, directories first, as they were found
+
+        """
+
+        nodes = list (reversed (self.getChildren ()))
+        while nodes:
+            inode = nodes.pop ()
+            yield inode
+            nodes.extend (reversed (inode.getChildren ()))
+
+
+    def getDirectories (self):
+        """return the number of directories under this node"""
+
+        return self._directories
+
+
+    def getFiles (self):
+        """return the number of files under this node"""
+
+        return self._files
+
+
+    def isDirectory (self):
+        """return whether this node is a directory"""
+
+        return not self or self.endswith ('/')
+
+
 # Local Variables:
 # mode:python
 # fill-column:80
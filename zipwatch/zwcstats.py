@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# zwcstats.py
+# Description: statistics of the components of schemas which persist across
+#              runs
+# -----------------------------------------------------------------------------
+#
+# Login   <carlos.linares@uc3m.es>
+#
+
+"""
+statistics of the components of schemas which persist across runs
+"""
+
+# imports
+# -----------------------------------------------------------------------------
+import json                     # json encoding and decoding
+import os                       # path filesystem
+import threading                # locks
+
+import zwcmatcher
+
+# -----------------------------------------------------------------------------
+# ZWCStats
+#
+# Number of hits and attempts of the components of schemas stored in a file
+# -----------------------------------------------------------------------------
+class ZWCStats:
+    """Number of hits and attempts of the components of schemas stored in a
+       file. Hits are the number of contents matched by a component, and
+       attempts are the number of contents evaluated by schemas with it.
+       Components are identified by their fingerprint (see
+       zwcmatcher.fingerprint), so that statistics are shared by all schemas
+       with the same component, and modifying a component starts its
+       statistics anew. Statistics can be recorded by different threads
+
+    """
+
+    def __init__ (self, filename):
+        """creates the statistics stored in the given file. If it does not exist,
+           there are no statistics yet. If it can not be read, a warning is
+           shown and its statistics are ignored
+
+        """
+
+        (self._filename, self._stats, self._lock) = (filename, dict (), threading.Lock ())
+
+        if os.path.exists (filename):
+            try:
+                with open (filename) as stream:
+                    self._stats = json.load (stream)
+                if not isinstance (self._stats, dict) or \
+                   not all (isinstance (ivalue, list) and len (ivalue) == 2 and
+                            all (isinstance (icount, int) and icount >= 0 for icount in ivalue)
+                            for ivalue in self._stats.values ()):
+                    raise ValueError ("the statistics are not given as pairs of counts")
+            except (OSError, ValueError) as error:
+                print (" Warning: the statistics in '{0}' have been ignored: {1}".format (filename, error))
+                self._stats = dict ()
+
+
+    def __str__ (self):
+        """return a human readable version of these statistics"""
+
+        return " {0} components in '{1}'".format (len (self._stats), self._filename)
+
+
+    @staticmethod
+    def key (component):
+        """return the key of the given component, an instance of
+           ZWCSchemaComponent, in the statistics
+
+        """
+
+        return repr (zwcmatcher.fingerprint ([component])[0])
+
+
+    def getFilename (self):
+        """return the name of the file with these statistics"""
+
+        return self._filename
+
+
+    def getHits (self, component):
+        """return the number of hits of the given component"""
+
+        return self._stats.get (ZWCStats.key (component), [0, 0])[0]
+
+
+    def getAttempts (self, component):
+        """return the number of attempts of the given component"""
+
+        return self._stats.get (ZWCStats.key (component), [0, 0])[1]
+
+
+    def getFrequency (self, component):
+        """return the fraction of attempts of the given component which were hits,
+           or 0 if there is none
+
+        """
+
+        (hits, attempts) = self._stats.get (ZWCStats.key (component), [0, 0])
+        return hits / attempts if attempts else 0
+
+
+    def record (self, component, hits, attempts):
+        """add the given number of hits and attempts to the statistics of the given
+           component
+
+        """
+
+        key = ZWCStats.key (component)
+        with self._lock:
+            previous = self._stats.get (key, [0, 0])
+            self._stats[key] = [previous[0] + hits, previous[1] + attempts]
+
+
+    def save (self):
+        """write these statistics to their file. The file is replaced only once the
+           new statistics have been written, so that it is never left half
+           written. If it can not be written, a warning is shown
+
+        """
+
+        temporary = self._filename + ".tmp"
+        with self._lock:
+            try:
+                with open (temporary, "w") as stream:
+                    json.dump (self._stats, stream, indent=1, sort_keys=True)
+                os.replace (temporary, self._filename)
+            except OSError as error:
+                print (" Warning: the statistics could not be written to '{0}': {1}".format (self._filename, error))
+
+
+# Local Variables:
+# mode:python
+# fill-column:80
+# End: